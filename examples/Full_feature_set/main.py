@@ -161,10 +161,7 @@ except Exception as e:
 
 # Initial state of actuators and configuration must be delivered to the platform
 # in order to be able to change their values from the platform
-wolk.publish_actuator_status("SW")
-wolk.publish_actuator_status("SL")
-
-wolk.publish_configuration()
+wolk.sync_state()
 
 try:
     while True:
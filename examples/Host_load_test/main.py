@@ -0,0 +1,89 @@
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""
+Load test of Wolk on a host machine.
+
+Many simulated devices share one FakeBroker with latency and message loss.
+Every device stores sensor readings, receives actuation commands and
+publishes, and the throughput is printed at the end.
+
+Run from this directory with CPython 3: python3 main.py
+"""
+import time
+
+import zerynth_shim
+
+zerynth_shim.install()
+iot, lcs, wapmd = zerynth_shim.load(
+    "wolk.loopback_connectivity_service", "wolk.wolkabout_protocol_message_deserializer"
+)
+
+DEVICES = 50
+STEPS = 200
+READINGS_PER_STEP = 5
+PUBLISH_EVERY = 10
+STEP_MS = 100
+
+
+class Actuator:
+    def __init__(self):
+        self.value = False
+
+    def handle(self, reference, value):
+        self.value = value
+
+    def status(self, reference):
+        return iot.ACTUATOR_STATE_READY, self.value
+
+
+broker = lcs.FakeBroker(latency_ms=50, loss_rate=0.01)
+devices = []
+for index in range(DEVICES):
+    device = iot.Device("device%d" % index, "password", ["SW"])
+    actuator = Actuator()
+    # Receive only the topics of this device, as the real broker would
+    topics = wapmd.WolkAboutProtocolMessageDeserializer(device).get_inbound_topics()
+    wolk = iot.Wolk(
+        device,
+        actuation_handler=actuator.handle,
+        actuator_status_provider=actuator.status,
+        keep_alive_enabled=False,
+        connectivity_service=lcs.LoopbackConnectivityService(broker, topics),
+        message_queue_size=200,
+    )
+    wolk.connect()
+    devices.append((device, wolk))
+
+started = time.monotonic()
+stored = 0
+for step in range(STEPS):
+    for device, wolk in devices:
+        for reading in range(READINGS_PER_STEP):
+            if wolk.add_sensor_reading("T", 20 + (step + reading) % 10):
+                stored += 1
+        if step % PUBLISH_EVERY == 0:
+            wolk.publish()
+            broker.inject_actuation(device.key, "SW", step % 2 == 0)
+    broker.advance(STEP_MS)
+
+for device, wolk in devices:
+    wolk.publish()
+broker.advance(STEP_MS)
+elapsed = time.monotonic() - started
+
+print("devices:", DEVICES)
+print("readings stored:", stored)
+print("messages published:", len(broker.published))
+print("messages lost by the broker:", broker.lost)
+print("elapsed: %.2f s, %.0f readings/s" % (elapsed, stored / elapsed))
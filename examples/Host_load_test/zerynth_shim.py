@@ -0,0 +1,118 @@
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""
+Run the library under CPython on a host machine.
+
+Installs stand-ins for the Zerynth builtins and modules the library uses,
+makes the repository importable as wolkabout.iot and maps Zerynth type
+codes, so Wolk can be driven through LoopbackConnectivityService.
+Nothing here talks to a network: MQTT, TLS and name resolution are not
+available on the host.
+"""
+import builtins
+import os
+import sys
+import threading
+import time
+import types
+
+_EXAMPLE = os.path.dirname(os.path.abspath(__file__))
+_REPOSITORY = os.path.dirname(os.path.dirname(_EXAMPLE))
+
+# Zerynth type codes returned by type() on the device
+_TYPE_CODES = {
+    bool: 3,
+    int: 1,
+    float: 2,
+    str: 4,
+    bytes: 5,
+    bytearray: 6,
+    list: 9,
+    tuple: 10,
+}
+
+_python_type = type
+
+
+def _zerynth_type(value):
+    return _TYPE_CODES.get(_python_type(value), _python_type(value))
+
+
+def _thread(function, *args):
+    worker = threading.Thread(target=function, args=args)
+    worker.daemon = True
+    worker.start()
+    return worker
+
+
+def _c_native(name, sources, flags):
+    # The only native function of the library converts a list to a tuple
+    def decorate(function):
+        return tuple
+
+    return decorate
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    for key, value in attributes.items():
+        setattr(module, key, value)
+    sys.modules[name] = module
+    return module
+
+
+class _UnavailableMqttClient:
+    def __init__(self, *args, **kwargs):
+        raise RuntimeError(
+            "MQTT is not available on the host, use LoopbackConnectivityService"
+        )
+
+
+def install():
+    """Install the stand-ins, must be called before importing wolkabout."""
+    builtins.thread = _thread
+    builtins.sleep = lambda milliseconds: time.sleep(milliseconds / 1000)
+    builtins.c_native = _c_native
+    builtins.new_exception = lambda name, base: None
+    builtins.InterfaceNotProvided = _python_type(
+        "InterfaceNotProvided", (Exception,), {}
+    )
+
+    _module("timers", now=lambda: int(time.monotonic() * 1000))
+    mqtt_package = _module("mqtt")
+    mqtt_package.mqtt = _module("mqtt.mqtt", Client=_UnavailableMqttClient, PUBLISH=0)
+
+    wolkabout = _module("wolkabout")
+    wolkabout.__path__ = []
+    wolkabout.iot = _module("wolkabout.iot")
+    wolkabout.iot.__path__ = [_REPOSITORY]
+
+
+def load(*names):
+    """
+    Import library modules with Zerynth type codes in place.
+
+    :param names: Module names relative to wolkabout.iot, e.g. "wolk.file_transfer"
+    :returns: the iot module followed by the requested modules
+    :rtype: list
+    """
+    import importlib
+
+    modules = [importlib.import_module("wolkabout.iot.iot")]
+    for name in names:
+        modules.append(importlib.import_module("wolkabout.iot." + name))
+    for name, module in list(sys.modules.items()):
+        if name.startswith("wolkabout.iot.") and module is not None:
+            module.type = _zerynth_type
+    return modules
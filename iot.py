@@ -25,15 +25,24 @@ a complete IoT solution: `WolkAbout IoT Platform <https://wolkabout.com/>`_
 #   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
+import threading
 import timers
 
 from wolkabout.iot.wolk import wolkabout_protocol_message_factory as wapmf
 from wolkabout.iot.wolk import wolkabout_protocol_message_deserializer as wapmd
 from wolkabout.iot.wolk import zerynth_message_queue as zmq
 from wolkabout.iot.wolk import mqtt_connectivity_service as mcs
+from wolkabout.iot.wolk import object_pool
+from wolkabout.iot.wolk import auto_flush
+from wolkabout.iot.wolk import timer_wheel
+from wolkabout.iot.wolk import publish_worker
+from wolkabout.iot.wolk import traffic_recorder
+from wolkabout.iot.wolk import outbound_buffer
+from wolkabout.iot.wolk import uplink_budget as ub
 from wolkabout.iot.wolk.model import sensor_reading
 from wolkabout.iot.wolk.model import alarm
 from wolkabout.iot.wolk.model import actuator_status
+from wolkabout.iot.wolk.model import message as wolk_message
 
 new_exception(InterfaceNotProvided, Exception)  # noqa
 
@@ -69,6 +78,23 @@ ACTUATOR_STATE_READY = "READY"
 ACTUATOR_STATE_BUSY = "BUSY"
 ACTUATOR_STATE_ERROR = "ERROR"
 
+# "Enum" of outcomes of filtering a reading by deadband and uplink budget
+_READING_ADMITTED = 0  # store the returned value
+_READING_ABSORBED = 1  # skipped by a deadband or merged into an average
+_READING_DROPPED = 2  # dropped because only alarms are sent
+
+
+class _SensorSampler:
+    """Add a reading returned by a sampler function, called by the scheduler."""
+
+    def __init__(self, wolk, reference, sampler):
+        self.wolk = wolk
+        self.reference = reference
+        self.sampler = sampler
+
+    def sample(self):
+        self.wolk.add_sensor_reading(self.reference, self.sampler())
+
 
 class Wolk:
 
@@ -83,6 +109,21 @@ class Wolk:
         configuration_provider=None,
         message_queue_size=100,
         keep_alive_enabled=True,
+        configuration_delta=False,
+        backlog_store=None,
+        actuator_wildcard_subscription=False,
+        sync_state_on_connect=False,
+        queue_compaction=None,
+        inbound_limiter=None,
+        connectivity_service=None,
+        message_queue_bytes=None,
+        message_ttl=None,
+        uplink_budget=None,
+        persistent_store=None,
+        broker_endpoints=None,
+        tls_ca_cert=None,
+        persistent_session=False,
+        file_transfer=None,
     ):
         """
 
@@ -91,7 +132,7 @@ Wolk
 
 The :samp:`Wolk` class wraps all the functionality of the library.
 
-.. method:: Wolk(device, host="api-demo.wolkabout.com", port=2883, actuation_handler=None, actuator_status_provider=None, configuration_handler=None, configuration_provider=None, message_queue_size=100, keep_alive_enabled=True)
+.. method:: Wolk(device, host="api-demo.wolkabout.com", port=2883, actuation_handler=None, actuator_status_provider=None, configuration_handler=None, configuration_provider=None, message_queue_size=100, keep_alive_enabled=True, configuration_delta=False, backlog_store=None, actuator_wildcard_subscription=False, sync_state_on_connect=False, queue_compaction=None, inbound_limiter=None, connectivity_service=None, message_queue_bytes=None, message_ttl=None, uplink_budget=None, persistent_store=None, broker_endpoints=None, tls_ca_cert=None, persistent_session=False, file_transfer=None)
 
 * :samp:`device`: Device containing key, password and actuator references
 * :samp:`host`: Address of the MQTT broker of the Platform - defaults to demo instance
@@ -142,24 +183,107 @@ The :samp:`Wolk` class wraps all the functionality of the library.
 
 * :samp:`message_queue_size`: Number of reading to store in memory, defaults to 100
 * :samp:`keep_alive_enabled`: Periodically publish keep alive message, default True
+* :samp:`configuration_delta`: Publish only configuration references changed since the last configuration acknowledged by the Platform, default False
+* :samp:`backlog_store`: (optional) :samp:`ColumnarBacklogStore` that keeps timestamped numeric readings in compact form while disconnected
+* :samp:`actuator_wildcard_subscription`: Subscribe to all actuators with a single wildcard topic instead of one topic per actuator, default False
+* :samp:`sync_state_on_connect`: Publish all actuator statuses and the configuration after connecting and after every reconnect, default False
+* :samp:`queue_compaction`: (optional) :samp:`QueueCompaction` used to merge stored sensor readings when storage is full, instead of rejecting new messages
+* :samp:`inbound_limiter`: (optional) :samp:`InboundLimiter` that rate limits and buffers inbound messages, which are then handled on the publish thread; file transfer messages bypass it
+* :samp:`message_queue_bytes`: (optional) Maximum total size in bytes of topics and payloads of stored messages, in addition to :samp:`message_queue_size`
+* :samp:`message_ttl`: (optional) :samp:`MessageTtl` after which stored messages are no longer published
+* :samp:`uplink_budget`: (optional) :samp:`UplinkBudget` counting sent bytes; as it runs out, deadbands are widened, then readings are averaged, then only alarms are sent
+* :samp:`persistent_store`: (optional) Message queue that survives restarts; messages left over when disconnecting are moved into it and published after the next connect
+* :samp:`broker_endpoints`: (optional) :samp:`BrokerEndpoints` to connect to instead of :samp:`host` and :samp:`port`, choosing the fastest healthy one and failing over to the others
+* :samp:`tls_ca_cert`: (optional) PEM certificate of the CA that signed the broker certificate; connects over TLS when given; the SSL context is created once and reused on reconnects
+* :samp:`persistent_session`: Keep the MQTT session on the broker while disconnected, so actuation commands sent meanwhile are delivered, default False
+* :samp:`file_transfer`: (optional) :samp:`FileTransfer` receiving files in chunks, e.g. firmware; uses this library's own topics and is not compatible with file transfer of the WolkAbout IoT Platform
+* :samp:`connectivity_service`: (optional) Connectivity service to use instead of connecting to :samp:`host` over MQTT, e.g. :samp:`LoopbackConnectivityService` for testing
 
   
         """
         self.device = device
-        self.message_factory = wapmf.WolkAboutProtocolMessageFactory(device.key)
-        self.message_deserializer = wapmd.WolkAboutProtocolMessageDeserializer(device)
-        self.message_queue = zmq.ZerynthMessageQueue(message_queue_size)
-        self.connectivity_service = mcs.MQTTConnectivityService(
-            device, self.message_deserializer.get_inbound_topics(), host, port
+        self._message_pool = object_pool.ObjectPool(
+            lambda: wolk_message.Message(None, None), message_queue_size
+        )
+        self._reading_pool = object_pool.ObjectPool(
+            lambda: sensor_reading.SensorReading(None, None), 1
         )
-        self.connectivity_service.set_inbound_message_listener(self._on_inbound_message)
+        self._alarm_pool = object_pool.ObjectPool(lambda: alarm.Alarm(None, None), 1)
+        self._outbound_buffer = outbound_buffer.OutboundBuffer()
+        self._outbound_buffer_lock = threading.Lock()
+        # Held while draining stored messages, so concurrent publishers don't
+        # send or release the same message twice
+        self._publish_lock = threading.Lock()
+        self._actuator_status_pool = object_pool.ObjectPool(
+            lambda: actuator_status.ActuatorStatus(None, None, None), 1
+        )
+        self.message_factory = wapmf.WolkAboutProtocolMessageFactory(
+            device.key, self._message_pool
+        )
+        self.message_deserializer = wapmd.WolkAboutProtocolMessageDeserializer(
+            device, actuator_wildcard_subscription, file_transfer is not None
+        )
+        self.message_queue = zmq.ZerynthMessageQueue(
+            message_queue_size, queue_compaction, message_queue_bytes, message_ttl
+        )
+        if connectivity_service is None:
+            connectivity_service = mcs.MQTTConnectivityService(
+                device,
+                self.message_deserializer.get_inbound_topics(),
+                host,
+                port,
+                endpoints=broker_endpoints,
+                tls_ca_cert=tls_ca_cert,
+                persistent_session=persistent_session,
+            )
+        self.uplink_budget = uplink_budget
+        if uplink_budget is not None:
+            connectivity_service = ub.MeteredConnectivityService(
+                connectivity_service, uplink_budget
+            )
+        self.connectivity_service = connectivity_service
+        self._deadbands = {}
+        self._last_admitted_values = {}
+        self._aggregates = {}
+        self.inbound_limiter = inbound_limiter
+        if inbound_limiter is None:
+            self._inbound_message_listener = self._on_inbound_message
+        else:
+            self._inbound_message_listener = self._on_limited_inbound_message
+        self.connectivity_service.set_inbound_message_listener(
+            self._inbound_message_listener
+        )
+        self.connectivity_service.set_connection_listener(self._on_connected)
         self.actuation_handler = actuation_handler
         self.actuator_status_provider = actuator_status_provider
         self.configuration_handler = configuration_handler
         self.configuration_provider = configuration_provider
         self.keep_alive_enabled = keep_alive_enabled
         self.keep_alive_service = None
+        self.scheduler = timer_wheel.TimerWheel()
+        self.publish_worker = publish_worker.PublishWorker()
+        self._keep_alive_job = self.publish_worker.add(self._send_keep_alive)
+        self._samplers = {}
+        if inbound_limiter is not None:
+            self.scheduler.schedule(
+                self.scheduler.tick_ms,
+                self.publish_worker.add(self._handle_inbound).signal,
+            )
+        self.file_transfer = file_transfer
+        if file_transfer is not None:
+            file_transfer.set_listeners(
+                self._request_file_chunks, self._report_file_transfer_status
+            )
+            self.scheduler.schedule(
+                1000, self.publish_worker.add(file_transfer.check).signal
+            )
         self.last_platform_timestamp = None
+        self.configuration_delta = configuration_delta
+        self._acknowledged_configuration = None
+        self.backlog_store = backlog_store
+        self.persistent_store = persistent_store
+        self.sync_state_on_connect = sync_state_on_connect
+        self.auto_flush = None
 
         if device.actuator_references and (
             actuation_handler is None or actuator_status_provider is None
@@ -174,25 +298,202 @@ Connect to the Platform.
 
         """
         self.connectivity_service.connect()
+        self.scheduler.start()
+        self.publish_worker.start()
         if self.keep_alive_enabled:
-            self.keep_alive_service = timers.timer()
-            self.keep_alive_service.interval(60000, self._send_keep_alive)
-            self.keep_alive_service.start()
+            self.keep_alive_service = self.scheduler.schedule(
+                60000, self._keep_alive_job.signal
+            )
+        if self.auto_flush is not None:
+            self.auto_flush.start()
+
+    def _on_connected(self):
+        self._acknowledged_configuration = None
+        if self.sync_state_on_connect:
+            self.sync_state()
 
-    def disconnect(self):
+    DRAIN_BATCH_SIZE = 10
+    # Readings expanded from the backlog store at a time
+    BACKLOG_SLICE_SIZE = 16
+
+    def disconnect(self, drain_timeout_ms=0):
         """
-.. method:: Wolk.disconnect()
+.. method:: Wolk.disconnect(drain_timeout_ms=0)
 Disconnect from the Platform.
 
+Stored messages are published in batches of :samp:`DRAIN_BATCH_SIZE` until none are left
+or :samp:`drain_timeout_ms` have passed. Messages that are left over are moved to the
+persistent store if one is configured, otherwise they are discarded.
+
+* :samp:`drain_timeout_ms`: (optional) Time in milliseconds to spend publishing stored messages before disconnecting, default 0
+
 
         """
+        if self.auto_flush is not None:
+            self.auto_flush.stop()
+        # Waits for a flush in progress on the publish worker to finish
+        self._publish_lock.acquire()
+        try:
+            if drain_timeout_ms > 0 and self.connectivity_service.connected():
+                deadline = timers.now() + drain_timeout_ms
+                if self.backlog_store is None or self._publish_backlog(deadline):
+                    self._publish_queue(deadline)
+            if self.persistent_store is not None:
+                self._persist_outbox()
+        finally:
+            self._publish_lock.release()
         self.connectivity_service.disconnect()
-        if self.keep_alive_enabled:
-            self.keep_alive_service.stop()
+        if self.keep_alive_service is not None:
+            self.scheduler.cancel(self.keep_alive_service)
+            self.keep_alive_service = None
+
+    def enable_auto_flush(
+        self,
+        max_messages=10,
+        max_age_ms=None,
+        period_ms=10000,
+        min_period_ms=1000,
+        max_period_ms=60000,
+    ):
+        """
+.. method:: Wolk.enable_auto_flush(max_messages=10, max_age_ms=None, period_ms=10000, min_period_ms=1000, max_period_ms=60000)
+Publish stored messages automatically instead of calling :samp:`Wolk.publish()`.
+
+Messages are published when :samp:`max_messages` are stored, when the oldest stored message
+is :samp:`max_age_ms` old, or every publish period. The period starts at :samp:`period_ms` and is
+shortened while the queue is filling up and lengthened while it stays nearly empty,
+staying between :samp:`min_period_ms` and :samp:`max_period_ms`.
+
+* :samp:`max_messages`: Number of stored messages that triggers publishing
+* :samp:`max_age_ms`: (optional) Age of the oldest stored message that triggers publishing
+* :samp:`period_ms`: Initial publish period
+* :samp:`min_period_ms`: Shortest publish period
+* :samp:`max_period_ms`: Longest publish period
+
+
+        """
+        if self.auto_flush is not None:
+            self.auto_flush.stop()
+
+        self.auto_flush = auto_flush.AutoFlush(
+            self._auto_publish,
+            self.message_queue,
+            self.scheduler,
+            max_messages,
+            max_age_ms,
+            period_ms,
+            min_period_ms,
+            max_period_ms,
+            worker=self.publish_worker,
+        )
+        if self.connectivity_service.connected():
+            self.auto_flush.start()
+
+    def add_sensor_sampler(self, reference, period_ms, sampler):
+        """
+.. method:: Wolk.add_sensor_sampler(reference, period_ms, sampler)
+Periodically sample a sensor and add its reading into storage.
+
+All samplers share the single thread of :samp:`Wolk.scheduler`, which is started on
+:samp:`Wolk.connect()` or by this method and keeps sampling while disconnected.
+Keep alive messages and automatic publishing are only signalled from it and run on the
+thread of :samp:`Wolk.publish_worker`, so a slow publish doesn't delay sampling.
+
+* :samp:`reference`: The reference of the sensor
+* :samp:`period_ms`: Sampling period in milliseconds
+* :samp:`sampler`: Function without arguments returning the current value of the sensor
+
+
+        """
+        self.remove_sensor_sampler(reference)
+        sensor_sampler = _SensorSampler(self, reference, sampler)
+        self._samplers[reference] = self.scheduler.schedule(
+            period_ms, sensor_sampler.sample
+        )
+        self.scheduler.start()
+
+    def remove_sensor_sampler(self, reference):
+        """
+.. method:: Wolk.remove_sensor_sampler(reference)
+Stop periodically sampling a sensor.
+
+* :samp:`reference`: The reference of the sensor
+
+
+        """
+        if reference in self._samplers:
+            self.scheduler.cancel(self._samplers.pop(reference))
+
+    def set_error_handler(self, handler):
+        """
+.. method:: Wolk.set_error_handler(handler)
+Set the function called with exceptions raised by samplers, keep alive messages, automatic
+publishing and other work running on the library's own threads.
+
+* :samp:`handler`: Function taking the exception as its only argument
+
+
+        """
+        self.scheduler.error_handler = handler
+        self.publish_worker.error_handler = handler
+
+    def _auto_publish(self):
+        if self.connectivity_service.connected():
+            self.publish()
+
+    def _store(self, message):
+        if not self.message_queue.put(message):
+            self._message_pool.release(message)
+            return False
+
+        if self.auto_flush is not None:
+            self.auto_flush.on_message_added()
+        return True
+
+    def _message_added(self):
+        if self.auto_flush is not None:
+            self.auto_flush.on_message_added()
+
+    def queue_occupancy(self):
+        """
+.. method:: Wolk.queue_occupancy()
+Return the number of stored messages and the storage capacity.
+
+:return: (stored, capacity)
+:rtype: tuple
+
+        """
+        return self.message_queue.size(), self.message_queue.max_size
+
+    def queue_usage(self):
+        """
+.. method:: Wolk.queue_usage()
+Return the number of bytes used by stored messages and the byte budget.
+
+:return: (used bytes, budget or None)
+:rtype: tuple
+
+        """
+        return self.message_queue.usage(), self.message_queue.max_bytes
+
+    def set_queue_watermarks(self, high, low, on_high, on_low):
+        """
+.. method:: Wolk.set_queue_watermarks(high, low, on_high, on_low)
+Get notified when storage is filling up, so sampling can be slowed down before data is lost.
+
+* :samp:`high`: Number of stored messages at which :samp:`on_high` is called
+* :samp:`low`: Number of stored messages at which :samp:`on_low` is called after :samp:`high` was reached
+* :samp:`on_high`: Function called with the number of stored messages
+* :samp:`on_low`: Function called with the number of stored messages
+
+
+        """
+        self.message_queue.set_watermarks(high, low, on_high, on_low)
 
     def _send_keep_alive(self):
         message = self.message_factory.make_from_ping_keep_alive_message()
         self.connectivity_service.publish(message)
+        self._message_pool.release(message)
 
     def add_sensor_reading(self, reference, value, timestamp=None):
         """
@@ -203,11 +504,166 @@ Add a sensor reading into storage.
 * :samp:`value`: The value of the sensor reading
 * :samp:`timestamp`: (optional) Unix timestamp - if not provided, Platform will assign one
 
+:return: True if stored, False if storage is full
+:rtype: bool
 
         """
-        reading = sensor_reading.SensorReading(reference, value, timestamp)
+        result, value = self._admit_reading(reference, value)
+        if result != _READING_ADMITTED:
+            return result == _READING_ABSORBED
+        return self._add_sensor_reading(reference, value, timestamp)
+
+    def _add_sensor_reading(self, reference, value, timestamp):
+        if (
+            self.backlog_store is not None
+            and not self.connectivity_service.connected()
+            and self.backlog_store.append(reference, value, timestamp)
+        ):
+            return True
+
+        reading = self._reading_pool.acquire()
+        reading.reference = reference
+        reading.value = value
+        reading.timestamp = timestamp
         message = self.message_factory.make_from_sensor_reading(reading)
-        self.message_queue.put(message)
+        self._reading_pool.release(reading)
+        return self._store(message)
+
+    def publish_sensor_reading(self, reference, value, timestamp=None):
+        """
+.. method:: Wolk.publish_sensor_reading(reference, value, timestamp=None)
+Publish a sensor reading immediately, bypassing storage.
+
+The reading is encoded into a preallocated buffer that is passed to the connection as is.
+If not connected, or the reading can not be encoded that way, it is added into storage instead.
+
+* :samp:`reference`: The reference of the sensor
+* :samp:`value`: The value of the sensor reading
+* :samp:`timestamp`: (optional) Unix timestamp - if not provided, Platform will assign one
+
+:return: True if published or stored, False if storage is full
+:rtype: bool
+
+        """
+        result, value = self._admit_reading(reference, value)
+        if result != _READING_ADMITTED:
+            return result == _READING_ABSORBED
+
+        if self.connectivity_service.connected():
+            reading = self._reading_pool.acquire()
+            reading.reference = reference
+            reading.value = value
+            reading.timestamp = timestamp
+            self._outbound_buffer_lock.acquire()
+            try:
+                encoded = self.message_factory.encode_sensor_reading(
+                    reading, self._outbound_buffer
+                )
+                if encoded is not None and self.connectivity_service.publish_buffer(
+                    encoded[0], encoded[1]
+                ):
+                    return True
+            finally:
+                self._outbound_buffer_lock.release()
+                self._reading_pool.release(reading)
+
+        return self._add_sensor_reading(reference, value, timestamp)
+
+    def set_deadband(self, reference, deadband):
+        """
+.. method:: Wolk.set_deadband(reference, deadband)
+Skip numeric readings of a sensor that differ less than :samp:`deadband` from the last added reading.
+
+When an uplink budget is running out, deadbands are widened by its :samp:`deadband_factor`.
+
+* :samp:`reference`: The reference of the sensor
+* :samp:`deadband`: Smallest change worth sending, :samp:`None` removes the deadband
+
+
+        """
+        if deadband is None:
+            self._deadbands.pop(reference, None)
+        else:
+            self._deadbands[reference] = deadband
+
+    def _admit_reading(self, reference, value):
+        # Returns (_READING_*, value to store)
+        level = ub.NORMAL
+        if self.uplink_budget is not None:
+            level = self.uplink_budget.level()
+            if level == ub.ALARMS_ONLY:
+                self.uplink_budget.suppressed += 1
+                return _READING_DROPPED, None
+
+        value_type = type(value)
+        if not (value_type == 0 or value_type == 1 or value_type == 2):  # numbers
+            return _READING_ADMITTED, value
+
+        if reference in self._deadbands and reference in self._last_admitted_values:
+            deadband = self._deadbands[reference]
+            if level >= ub.WIDEN_DEADBANDS:
+                deadband *= self.uplink_budget.deadband_factor
+            if abs(value - self._last_admitted_values[reference]) < deadband:
+                if self.uplink_budget is not None:
+                    self.uplink_budget.suppressed += 1
+                return _READING_ABSORBED, None
+
+        if level >= ub.AGGREGATE:
+            aggregate = self._aggregates.get(reference)
+            if aggregate is None:
+                aggregate = [0, 0]
+                self._aggregates[reference] = aggregate
+            aggregate[0] += value
+            aggregate[1] += 1
+            if aggregate[1] < self.uplink_budget.aggregate_size:
+                self.uplink_budget.suppressed += 1
+                return _READING_ABSORBED, None
+            value = aggregate[0] / aggregate[1]
+            del self._aggregates[reference]
+
+        self._last_admitted_values[reference] = value
+        return _READING_ADMITTED, value
+
+    def _alarms_only(self):
+        return (
+            self.uplink_budget is not None
+            and self.uplink_budget.level() == ub.ALARMS_ONLY
+        )
+
+    def add_snapshot(self, readings, timestamp=None):
+        """
+.. method:: Wolk.add_snapshot(readings, timestamp=None)
+Add readings of multiple sensors sampled at the same time into storage with a single queue operation.
+
+Every reading is stored as its own message, all sharing :samp:`timestamp`.
+Deadbands and the uplink budget apply to each reading as in :samp:`Wolk.add_sensor_reading()`.
+
+* :samp:`readings`: Dictionary with sensor reference as key and reading value as value
+* :samp:`timestamp`: (optional) Unix timestamp shared by all readings - if not provided, Platform will assign one
+
+:return: True if all readings are stored, False if storage is full
+:rtype: bool
+
+        """
+        admitted_readings = {}
+        dropped = False
+        for reference, value in readings.items():
+            result, value = self._admit_reading(reference, value)
+            if result == _READING_ADMITTED:
+                admitted_readings[reference] = value
+            elif result == _READING_DROPPED:
+                dropped = True
+        if not admitted_readings:
+            return not dropped
+
+        messages = self.message_factory.make_from_sensor_snapshot(
+            admitted_readings, timestamp
+        )
+        stored = self.message_queue.put_all(messages)
+        for index in range(stored, len(messages)):
+            self._message_pool.release(messages[index])
+        self._message_added()
+        return not dropped and stored == len(messages)
 
     def add_alarm(self, reference, active, timestamp=None):
         """
@@ -218,25 +674,174 @@ Add an alarm event into storage.
 * :samp:`active`: Current state of the alarm
 * :samp:`timestamp`: (optional) Unix timestamp - if not provided, Platform will assign one
 
+:return: True if stored, False if storage is full
+:rtype: bool
 
         """
-        alarm_event = alarm.Alarm(reference, active, timestamp)
+        alarm_event = self._alarm_pool.acquire()
+        alarm_event.reference = reference
+        alarm_event.active = active
+        alarm_event.timestamp = timestamp
         message = self.message_factory.make_from_alarm(alarm_event)
-        self.message_queue.put(message)
+        self._alarm_pool.release(alarm_event)
+        return self._store(message)
+
+    def set_number_format(self, reference, number_format):
+        """
+.. method:: Wolk.set_number_format(reference, number_format)
+Send numeric readings of a sensor with a limited precision instead of all digits.
+
+* :samp:`reference`: The reference of the sensor
+* :samp:`number_format`: :samp:`number_format.NumberFormat` to use, :samp:`None` restores the default formatting
+
+
+        """
+        self.message_factory.set_number_format(reference, number_format)
+
+    def add_sensor_readings(self, readings):
+        """
+.. method:: Wolk.add_sensor_readings(readings)
+Add multiple sensor readings into storage with a single queue operation.
+
+* :samp:`readings`: Iterable of :samp:`(reference, value)` or :samp:`(reference, value, timestamp)` tuples
+
+:return: Number of readings stored
+:rtype: int
+
+        """
+        admitted_readings = []
+        for reading in readings:
+            result, value = self._admit_reading(reading[0], reading[1])
+            if result == _READING_ADMITTED:
+                timestamp = reading[2] if len(reading) > 2 else None
+                admitted_readings.append((reading[0], value, timestamp))
+
+        messages = self.message_factory.make_from_sensor_readings(admitted_readings)
+        stored = self.message_queue.put_all(messages)
+        for index in range(stored, len(messages)):
+            self._message_pool.release(messages[index])
+        self._message_added()
+        return stored
+
+    def add_alarms(self, alarms):
+        """
+.. method:: Wolk.add_alarms(alarms)
+Add multiple alarm events into storage with a single queue operation.
+
+* :samp:`alarms`: Iterable of :samp:`(reference, active)` or :samp:`(reference, active, timestamp)` tuples
+
+:return: Number of alarms stored
+:rtype: int
+
+        """
+        messages = self.message_factory.make_from_alarms(alarms)
+        stored = self.message_queue.put_all(messages)
+        for index in range(stored, len(messages)):
+            self._message_pool.release(messages[index])
+        self._message_added()
+        return stored
 
     def publish(self):
         """
 .. method:: Wolk.publish()
 Publish all currently stored messages to the Platform.
 
+Readings kept in the backlog store are expanded and published first.
+Publishing stops at the first message that can't be sent; it and the rest stay stored.
+
 
         """
+        self._publish_lock.acquire()
+        try:
+            if self.persistent_store is not None and not self._publish_persisted():
+                return
+            if self.backlog_store is not None:
+                self._publish_backlog()
+            self._publish_queue()
+        finally:
+            self._publish_lock.release()
+
+    def _publish_queue(self, deadline=None):
+        # Stops at the first failed publish and leaves the rest queued
+        alarms_only = self._alarms_only()
+
+        batch = 0
         while True:
             message = self.message_queue.peek()
+            if message is None:
+                return True
+            if alarms_only and message.topic.startswith(
+                self.message_factory.SENSOR_READING
+            ):
+                if self.message_queue.pop(message):
+                    self._message_pool.release(message)
+                self.uplink_budget.suppressed += 1
+                continue
+            if self.connectivity_service.publish(message) is not True:
+                return False
+            # Only the caller that removed the message returns it to the pool
+            if self.message_queue.pop(message):
+                self._message_pool.release(message)
+            if deadline is not None:
+                batch += 1
+                if batch == self.DRAIN_BATCH_SIZE:
+                    if timers.now() >= deadline:
+                        return False
+                    batch = 0
+
+    def _publish_backlog(self, deadline=None):
+        alarms_only = self._alarms_only()
+        while not self.backlog_store.empty():
+            if deadline is not None and timers.now() >= deadline:
+                return False
+            # Readings stay in the store until they are published
+            reference, readings = self.backlog_store.peek(self.BACKLOG_SLICE_SIZE)
+            if alarms_only:
+                self.backlog_store.remove(reference, len(readings))
+                self.uplink_budget.suppressed += len(readings)
+                continue
+            messages = self.message_factory.make_from_sensor_readings(readings)
+            published = 0
+            while published < len(messages):
+                if not self.connectivity_service.publish(messages[published]):
+                    break
+                published += 1
+            for message in messages:
+                self._message_pool.release(message)
+            self.backlog_store.remove(reference, published)
+            if published < len(messages):
+                return False
+        return True
+
+    def _publish_persisted(self):
+        alarms_only = self._alarms_only()
+        while True:
+            message = self.persistent_store.peek()
+            if message is None:
+                return True
+            if alarms_only and message.topic.startswith(
+                self.message_factory.SENSOR_READING
+            ):
+                self.persistent_store.pop(message)
+                self.uplink_budget.suppressed += 1
+                continue
+            if not self.connectivity_service.publish(message):
+                return False
+            self.persistent_store.pop(message)
+
+    def _persist_outbox(self):
+        if self.backlog_store is not None:
+            while not self.backlog_store.empty():
+                reference, readings = self.backlog_store.peek(self.BACKLOG_SLICE_SIZE)
+                self.persistent_store.put_all(
+                    self.message_factory.make_from_sensor_readings(readings)
+                )
+                self.backlog_store.remove(reference, len(readings))
+        while True:
+            message = self.message_queue.get()
             if message is None:
                 break
-            if self.connectivity_service.publish(message) is True:
-                self.message_queue.get()
+            self.persistent_store.put(message)
 
     def publish_actuator_status(self, reference):
         """
@@ -251,10 +856,16 @@ Publish the current actuator status to the Platform.
             return
 
         state, value = self.actuator_status_provider(reference)
-        status = actuator_status.ActuatorStatus(reference, state, value)
+        status = self._actuator_status_pool.acquire()
+        status.reference = reference
+        status.state = state
+        status.value = value
         message = self.message_factory.make_from_actuator_status(status)
+        self._actuator_status_pool.release(status)
 
-        if not self.connectivity_service.publish(message):
+        if self.connectivity_service.publish(message):
+            self._message_pool.release(message)
+        else:
             self.message_queue.put(message)
 
     def publish_configuration(self):
@@ -262,16 +873,110 @@ Publish the current actuator status to the Platform.
 .. method:: Wolk.publish_configuration()
 Publish the current device configuration to the Platform.
 
+If :samp:`configuration_delta` is enabled, only the references whose values changed
+since the last successfully published configuration are sent.
+
 
         """
         if self.configuration_handler is None:
             return
 
         configuration = self.configuration_provider()
-        message = self.message_factory.make_from_configuration(configuration)
-        if not self.connectivity_service.publish(message):
+        snapshot = self.message_factory.make_configuration_snapshot(configuration)
+
+        if self.configuration_delta:
+            message = self.message_factory.make_from_configuration_snapshot(
+                snapshot, self._acknowledged_configuration
+            )
+            if message is None:
+                return
+        else:
+            message = self.message_factory.make_from_configuration_snapshot(snapshot)
+
+        if self.connectivity_service.publish(message):
+            self._acknowledged_configuration = snapshot
+            self._message_pool.release(message)
+        else:
             self.message_queue.put(message)
 
+    def sync_state(self):
+        """
+.. method:: Wolk.sync_state()
+Publish the status of every actuator and the current device configuration to the Platform.
+
+All messages are prepared first and then published back to back.
+Messages that could not be published are stored.
+
+
+        """
+        messages = []
+
+        references = self.device.actuator_references
+        if self.actuator_status_provider is not None and references:
+            status = self._actuator_status_pool.acquire()
+            for reference in references:
+                state, value = self.actuator_status_provider(reference)
+                status.reference = reference
+                status.state = state
+                status.value = value
+                messages.append(self.message_factory.make_from_actuator_status(status))
+            self._actuator_status_pool.release(status)
+
+        snapshot = None
+        if self.configuration_provider is not None:
+            snapshot = self.message_factory.make_configuration_snapshot(
+                self.configuration_provider()
+            )
+            messages.append(
+                self.message_factory.make_from_configuration_snapshot(snapshot)
+            )
+
+        for index in range(len(messages)):
+            if not self.connectivity_service.publish(messages[index]):
+                self.message_queue.put_all(messages[index:])
+                return
+            self._message_pool.release(messages[index])
+
+        if snapshot is not None:
+            self._acknowledged_configuration = snapshot
+
+    def record_traffic(self, stream):
+        """
+.. method:: Wolk.record_traffic(stream)
+Record every published and received message into a stream in a compact binary format.
+
+The recording can be fed back through a :samp:`Wolk` instance with :samp:`traffic_recorder.TrafficReplayer`.
+
+* :samp:`stream`: Writable binary stream, e.g. an opened file
+
+:return: The recorder, holding the number of recorded messages
+:rtype: TrafficRecorder
+
+        """
+        self.stop_recording()
+        recorder = traffic_recorder.TrafficRecorder(stream, timers.now)
+        recording = traffic_recorder.RecordingConnectivityService(
+            self.connectivity_service, recorder
+        )
+        recording.set_inbound_message_listener(self._inbound_message_listener)
+        self.connectivity_service = recording
+        return recorder
+
+    def stop_recording(self):
+        """
+.. method:: Wolk.stop_recording()
+Stop recording traffic started with :samp:`Wolk.record_traffic()`.
+
+
+        """
+        if isinstance(
+            self.connectivity_service, traffic_recorder.RecordingConnectivityService
+        ):
+            self.connectivity_service = self.connectivity_service.connectivity
+            self.connectivity_service.set_inbound_message_listener(
+                self._inbound_message_listener
+            )
+
     def request_timestamp(self):
         """
 .. method:: Wolk.request_timestamp()
@@ -284,6 +989,30 @@ If keep alive service is not enabled, this will always be None.
         """
         return self.last_platform_timestamp
 
+    def _on_limited_inbound_message(self, message):
+        reference = None
+        if self.message_deserializer.is_actuation_command(message):
+            reference = message.topic.split("/")[-1]
+        elif message.topic.startswith(self.message_deserializer.ACTUATOR_SET):
+            # Unknown reference received through the wildcard subscription
+            return
+        elif self.file_transfer is not None and (
+            self.message_deserializer.is_file_binary_response(message)
+            or self.message_deserializer.is_file_upload_initiate(message)
+            or self.message_deserializer.is_file_upload_abort(message)
+        ):
+            # File transfer is paced by its own window of requested chunks
+            self._on_inbound_message(message)
+            return
+        self.inbound_limiter.offer(message, reference)
+
+    def _handle_inbound(self):
+        while True:
+            message = self.inbound_limiter.poll()
+            if message is None:
+                return
+            self._on_inbound_message(message)
+
     def _on_inbound_message(self, message):
         if self.message_deserializer.is_actuation_command(message):
 
@@ -311,6 +1040,41 @@ If keep alive service is not enabled, this will always be None.
             self.last_platform_timestamp = self.message_deserializer.parse_keep_alive_response(
                 message
             )
+            return
+
+        if self.file_transfer is None:
+            return
+
+        if self.message_deserializer.is_file_binary_response(message):
+            chunk = self.message_deserializer.parse_file_binary_response(message)
+            if chunk is None:
+                self.file_transfer.reject_chunk()
+                return
+            self.file_transfer.receive_chunk(chunk[0], chunk[1], chunk[2])
+            return
+
+        if self.message_deserializer.is_file_upload_initiate(message):
+            request = self.message_deserializer.parse_file_upload_initiate(message)
+            if request is None:
+                self.file_transfer.reject()
+                return
+            self.file_transfer.start(request[0], request[1], request[2], request[3])
+            return
+
+        if self.message_deserializer.is_file_upload_abort(message):
+            self.file_transfer.abort()
+
+    def _request_file_chunks(self, name, chunk, window):
+        message = self.message_factory.make_file_chunk_request(name, chunk, window)
+        self.connectivity_service.publish(message)
+        self._message_pool.release(message)
+
+    def _report_file_transfer_status(self, name, state, error):
+        message = self.message_factory.make_from_file_transfer_status(
+            name, state, error
+        )
+        self.connectivity_service.publish(message)
+        self._message_pool.release(message)
 
 
 # "Enum" of version number
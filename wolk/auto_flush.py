@@ -0,0 +1,165 @@
+"""Automatic publishing of stored messages."""
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import threading
+import timers
+
+
+class AutoFlush:
+    """
+    Publish stored messages without the application calling Wolk.publish().
+
+    Messages are published when the queue holds max_messages messages,
+    when the oldest stored message is max_age_ms old, or when the
+    periodic tick fires. The tick period is shortened while the queue
+    is filling up and lengthened while it stays nearly empty.
+    """
+
+    def __init__(
+        self,
+        flush,
+        message_queue,
+        scheduler,
+        max_messages=10,
+        max_age_ms=None,
+        period_ms=10000,
+        min_period_ms=1000,
+        max_period_ms=60000,
+        high_fill=0.5,
+        low_fill=0.1,
+        worker=None,
+    ):
+        """
+        Configure the flush triggers.
+
+        :param flush: Method that publishes all stored messages
+        :type flush: Callable[[], None]
+        :param message_queue: Queue holding the stored messages
+        :type message_queue: MessageQueue
+        :param scheduler: Timer wheel running the tick
+        :type scheduler: TimerWheel
+        :param max_messages: Publish when this many messages are stored
+        :type max_messages: int
+        :param max_age_ms: (optional) Publish when the oldest message is this old
+        :type max_age_ms: int or None
+        :param period_ms: Initial tick period
+        :type period_ms: int
+        :param min_period_ms: Shortest tick period
+        :type min_period_ms: int
+        :param max_period_ms: Longest tick period
+        :type max_period_ms: int
+        :param high_fill: Queue fill ratio at a tick above which the period is halved
+        :type high_fill: float
+        :param low_fill: Queue fill ratio at a tick below which the period is doubled
+        :type low_fill: float
+        :param worker: (optional) Worker that runs flush, instead of the thread triggering it
+        :type worker: PublishWorker or None
+        """
+        self.flush = flush
+        self.message_queue = message_queue
+        self.scheduler = scheduler
+        self.max_messages = max_messages
+        self.max_age_ms = max_age_ms
+        self.period_ms = period_ms
+        self.min_period_ms = min_period_ms
+        self.max_period_ms = max_period_ms
+        self.high_fill = high_fill
+        self.low_fill = low_fill
+        self._pending_since = None
+        self._last_tick = None
+        self._lock = threading.Lock()
+        self._started = False
+        self._task = None
+        self._flush_job = None
+        if worker is not None:
+            self._flush_job = worker.add(self._flush)
+
+    def start(self):
+        """Start the periodic tick."""
+        self._last_tick = timers.now()
+        self._started = True
+        self._rearm()
+
+    def stop(self):
+        """Stop the periodic tick."""
+        self._started = False
+        if self._task is not None:
+            self.scheduler.cancel(self._task)
+            self._task = None
+
+    def on_message_added(self):
+        """Check the size and age triggers after messages were stored."""
+        if self._pending_since is None:
+            self._pending_since = timers.now()
+            self._rearm()
+
+        if self.message_queue.size() >= self.max_messages:
+            self._request_flush()
+
+    def _request_flush(self):
+        if self._flush_job is not None:
+            self._flush_job.signal()
+        else:
+            self._flush()
+
+    def _flush(self):
+        self._lock.acquire()
+        try:
+            self.flush()
+        finally:
+            if self.message_queue.size() == 0:
+                self._pending_since = None
+            else:
+                self._pending_since = timers.now()
+            self._lock.release()
+
+    def _on_timer(self):
+        if not self._started:
+            return
+
+        now = timers.now()
+        size = self.message_queue.size()
+
+        if now - self._last_tick >= self.period_ms:
+            self._last_tick = now
+            fill = 0
+            if self.message_queue.max_size > 0:
+                fill = size / self.message_queue.max_size
+            if fill >= self.high_fill:
+                self.period_ms = max(self.min_period_ms, self.period_ms // 2)
+            elif fill <= self.low_fill:
+                self.period_ms = min(self.max_period_ms, self.period_ms * 2)
+            if size > 0:
+                self._request_flush()
+        elif (
+            self.max_age_ms is not None
+            and self._pending_since is not None
+            and now - self._pending_since >= self.max_age_ms
+        ):
+            self._request_flush()
+
+        self._rearm()
+
+    def _rearm(self):
+        if not self._started:
+            return
+
+        now = timers.now()
+        delay = self.period_ms - (now - self._last_tick)
+        if self.max_age_ms is not None and self._pending_since is not None:
+            delay = min(delay, self.max_age_ms - (now - self._pending_since))
+
+        if self._task is not None:
+            self.scheduler.cancel(self._task)
+        self._task = self.scheduler.schedule(max(delay, 1), self._on_timer, False)
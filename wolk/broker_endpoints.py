@@ -0,0 +1,170 @@
+"""Broker endpoints with cached addresses and latency based selection."""
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import socket
+import timers
+
+# Sort keys of endpoints without a measurement and of endpoints in cooldown
+_UNMEASURED_MS = 1 << 20
+_COOLING_MS = 1 << 21
+
+
+class BrokerEndpoints:
+    """
+    Choose which of several brokers to connect to.
+
+    Healthy endpoints are tried fastest first, by a moving average of measured
+    connect latency, and endpoints that were never measured in the order given.
+    An endpoint that failed is skipped for a cooldown period that doubles with
+    each consecutive failure. Resolved addresses are kept across failures and
+    only resolved again after several consecutive failures.
+    """
+
+    def __init__(
+        self,
+        endpoints,
+        cooldown_ms=5000,
+        max_cooldown_ms=300000,
+        resolver=None,
+        resolve_after_failures=3,
+    ):
+        """
+        Configure the endpoints to choose from.
+
+        :param endpoints: (host, port) tuples, in order of preference
+        :type endpoints: List[tuple]
+        :param cooldown_ms: Time to skip an endpoint after its first failure
+        :type cooldown_ms: int
+        :param max_cooldown_ms: Longest time to skip a repeatedly failing endpoint
+        :type max_cooldown_ms: int
+        :param resolver: Function translating a host name to an IP address, defaults to socket.gethostbyname
+        :type resolver: Callable[[str], str] or None
+        :param resolve_after_failures: Consecutive failures after which the host name is resolved again
+        :type resolve_after_failures: int
+        """
+        if len(endpoints) == 0:
+            raise ValueError("At least one endpoint is required")
+        if resolve_after_failures < 1:
+            raise ValueError("resolve_after_failures must be at least 1")
+        self.hosts = []
+        self.ports = []
+        for endpoint in endpoints:
+            self.hosts.append(endpoint[0])
+            self.ports.append(endpoint[1])
+        count = len(self.hosts)
+        self.resolve_after_failures = resolve_after_failures
+        self.cooldown_ms = cooldown_ms
+        self.max_cooldown_ms = max_cooldown_ms
+        self.resolver = resolver
+        self.latency_ms = [None] * count
+        self._addresses = [None] * count
+        self._failures = [0] * count
+        self._failed_until = [0] * count
+
+    def address(self, index):
+        """
+        Return the address of an endpoint, resolving its host name only once.
+
+        If the host name can't be resolved, it is returned as is.
+
+        :param index: Index of the endpoint
+        :type index: int
+        :returns: IP address or host name
+        :rtype: str
+        """
+        if self._addresses[index] is None:
+            try:
+                if self.resolver is not None:
+                    self._addresses[index] = self.resolver(self.hosts[index])
+                else:
+                    self._addresses[index] = socket.gethostbyname(self.hosts[index])
+            except Exception:
+                return self.hosts[index]
+        return self._addresses[index]
+
+    def port(self, index):
+        """
+        Return the port of an endpoint.
+
+        :param index: Index of the endpoint
+        :type index: int
+        :returns: port
+        :rtype: int
+        """
+        return self.ports[index]
+
+    def candidates(self):
+        """
+        Return endpoint indices in the order they should be tried.
+
+        Endpoints in cooldown come last.
+
+        :returns: indices
+        :rtype: List[int]
+        """
+        now = timers.now()
+        ordered = []
+        for index in range(len(self.hosts)):
+            key = self._key(index, now)
+            position = len(ordered)
+            while position > 0 and self._key(ordered[position - 1], now) > key:
+                position -= 1
+            ordered.insert(position, index)
+        return ordered
+
+    def _key(self, index, now):
+        latency = self.latency_ms[index]
+        if latency is None:
+            latency = _UNMEASURED_MS
+        if self._failed_until[index] > now:
+            latency += _COOLING_MS
+        return latency
+
+    def report_success(self, index, latency_ms):
+        """
+        Record a completed connect and handshake to an endpoint.
+
+        :param index: Index of the endpoint
+        :type index: int
+        :param latency_ms: Time it took to connect
+        :type latency_ms: int
+        """
+        if self.latency_ms[index] is None:
+            self.latency_ms[index] = latency_ms
+        else:
+            self.latency_ms[index] = (3 * self.latency_ms[index] + latency_ms) // 4
+        self._failures[index] = 0
+        self._failed_until[index] = 0
+
+    def report_failure(self, index):
+        """
+        Record a failed connect or a dropped connection to an endpoint.
+
+        After every resolve_after_failures consecutive failures the cached
+        address is dropped, so the host name is resolved again.
+
+        :param index: Index of the endpoint
+        :type index: int
+        """
+        cooldown = self.cooldown_ms
+        for _ in range(self._failures[index]):
+            cooldown *= 2
+            if cooldown >= self.max_cooldown_ms:
+                cooldown = self.max_cooldown_ms
+                break
+        self._failures[index] += 1
+        self._failed_until[index] = timers.now() + cooldown
+        if self._failures[index] % self.resolve_after_failures == 0:
+            self._addresses[index] = None
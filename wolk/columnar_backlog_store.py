@@ -0,0 +1,298 @@
+"""Compact in-memory backlog for numeric sensor readings."""
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import threading
+
+
+def _zigzag(number):
+    return number * 2 if number >= 0 else -number * 2 - 1
+
+
+def _unzigzag(number):
+    return number // 2 if number % 2 == 0 else -(number + 1) // 2
+
+
+def _write_varint(buffer, number):
+    number = _zigzag(number)
+    while number > 127:
+        buffer.append((number & 127) | 128)
+        number >>= 7
+    buffer.append(number)
+
+
+def _read_varint(buffer, index):
+    number = 0
+    shift = 0
+    while True:
+        byte = buffer[index]
+        index += 1
+        number |= (byte & 127) << shift
+        if byte < 128:
+            return _unzigzag(number), index
+        shift += 7
+
+
+class _Column:
+    """Encoded readings of a single reference."""
+
+    __slots__ = (
+        "scale",
+        "data",
+        "count",
+        "last_value",
+        "last_timestamp",
+        "last_timestamp_delta",
+    )
+
+    def __init__(self, scale):
+        self.scale = scale
+        self.data = bytearray()
+        self.count = 0
+        self.last_value = 0
+        self.last_timestamp = 0
+        self.last_timestamp_delta = 0
+
+
+class ColumnarBacklogStore:
+    """
+    Store numeric sensor readings per reference in a compact form.
+
+    Values are stored as deltas from the previous value of the same
+    reference and timestamps as delta-of-delta, both as zigzag varints
+    in a bytearray. A steadily sampled, slowly changing sensor costs
+    two to four bytes per reading instead of a whole Message.
+
+    Readings can be appended from one thread while they are read and
+    removed from another, and are read back in bounded slices, so
+    publishing a full store doesn't expand it all at once.
+    """
+
+    def __init__(self, max_bytes=4096, decimals=None):
+        """
+        Create an empty backlog store.
+
+        Integer readings are stored exactly. Float readings are only
+        accepted for references with a configured number of decimals,
+        and are rounded to it.
+
+        :param max_bytes: Maximum number of bytes of encoded readings
+        :type max_bytes: int
+        :param decimals: Reference to number of decimals for float readings
+        :type decimals: dict or None
+        """
+        self.max_bytes = max_bytes
+        self.decimals = decimals if decimals is not None else {}
+        self._columns = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def append(self, reference, value, timestamp):
+        """
+        Store a reading if it can be represented by the store.
+
+        :param reference: The reference of the sensor
+        :type reference: str
+        :param value: The value of the sensor reading
+        :type value: int or float
+        :param timestamp: Unix timestamp of the reading
+        :type timestamp: int
+        :returns: True if stored, False if the caller has to store it elsewhere
+        :rtype: bool
+        """
+        if timestamp is None:
+            return False
+
+        self._lock.acquire()
+        try:
+            return self._append(reference, value, timestamp)
+        finally:
+            self._lock.release()
+
+    def _append(self, reference, value, timestamp):
+        column = self._columns.get(reference)
+        if column is None:
+            if reference in self.decimals:
+                scale = 10 ** self.decimals[reference]
+            else:
+                scale = 1
+            column = _Column(scale)
+
+        value_type = type(value)
+        if value_type == 2:  # PFLOAT
+            if column.scale == 1 and reference not in self.decimals:
+                return False
+            scaled = value * column.scale
+            scaled = int(scaled + 0.5) if scaled >= 0 else int(scaled - 0.5)
+        elif value_type == 0 or value_type == 1:  # PSMALLINT, PINTEGER
+            scaled = value * column.scale
+        else:
+            return False
+
+        timestamp_delta = timestamp - column.last_timestamp
+        start = len(column.data)
+        _write_varint(column.data, scaled - column.last_value)
+        _write_varint(column.data, timestamp_delta - column.last_timestamp_delta)
+        written = len(column.data) - start
+
+        if self._size + written > self.max_bytes:
+            del column.data[start:]
+            return False
+
+        if column.count == 0:
+            self._columns[reference] = column
+        column.count += 1
+        column.last_value = scaled
+        column.last_timestamp = timestamp
+        column.last_timestamp_delta = timestamp_delta
+        self._size += written
+        return True
+
+    def pop(self):
+        """
+        Remove all readings of one reference and expand them.
+
+        :returns: (reference, [(reference, value, timestamp), ...]) or None if empty
+        :rtype: tuple or None
+        """
+        self._lock.acquire()
+        try:
+            reference = None
+            for reference in self._columns:
+                break
+            if reference is None:
+                return None
+
+            column = self._columns.pop(reference)
+            self._size -= len(column.data)
+        finally:
+            self._lock.release()
+        return reference, self._expand(reference, column)
+
+    def peek(self, limit=None):
+        """
+        Expand the oldest readings of one reference without removing them.
+
+        :param limit: (optional) Largest number of readings to expand, all by default
+        :type limit: int or None
+        :returns: (reference, [(reference, value, timestamp), ...]) or None if empty
+        :rtype: tuple or None
+        """
+        self._lock.acquire()
+        try:
+            reference = None
+            for reference in self._columns:
+                break
+            if reference is None:
+                return None
+
+            return reference, self._expand(reference, self._columns[reference], limit)
+        finally:
+            self._lock.release()
+
+    def remove(self, reference, count):
+        """
+        Remove the oldest readings of a reference, e.g. once they are published.
+
+        :param reference: The reference of the sensor
+        :type reference: str
+        :param count: Number of readings to remove
+        :type count: int
+        """
+        self._lock.acquire()
+        try:
+            column = self._columns.get(reference)
+            if column is None or count <= 0:
+                return
+
+            if count >= column.count:
+                del self._columns[reference]
+                self._size -= len(column.data)
+                return
+
+            self._remove_oldest(column, count)
+        finally:
+            self._lock.release()
+
+    def _remove_oldest(self, column, count):
+        # Only the first two kept readings are encoded again, the deltas of
+        # the others don't depend on what came before them
+        data = column.data
+        value = 0
+        timestamp = 0
+        timestamp_delta = 0
+        index = 0
+        for _ in range(count + 1):
+            value_delta, index = _read_varint(data, index)
+            timestamp_delta_delta, index = _read_varint(data, index)
+            value += value_delta
+            timestamp_delta += timestamp_delta_delta
+            timestamp += timestamp_delta
+
+        # The first kept reading is encoded as if it had been appended first
+        head = bytearray()
+        _write_varint(head, value)
+        _write_varint(head, timestamp)
+        if count + 1 < column.count:
+            value_delta, index = _read_varint(data, index)
+            timestamp_delta_delta, index = _read_varint(data, index)
+            _write_varint(head, value_delta)
+            _write_varint(head, timestamp_delta + timestamp_delta_delta - timestamp)
+        else:
+            column.last_timestamp_delta = timestamp
+        head.extend(data[index:])
+
+        self._size += len(head) - len(data)
+        column.data = head
+        column.count -= count
+
+    def _expand(self, reference, column, limit=None):
+        readings = []
+        value = 0
+        timestamp = 0
+        timestamp_delta = 0
+        index = 0
+
+        count = column.count
+        if limit is not None and limit < count:
+            count = limit
+        for _ in range(count):
+            value_delta, index = _read_varint(column.data, index)
+            timestamp_delta_delta, index = _read_varint(column.data, index)
+            value += value_delta
+            timestamp_delta += timestamp_delta_delta
+            timestamp += timestamp_delta
+            if column.scale == 1:
+                readings.append((reference, value, timestamp))
+            else:
+                readings.append((reference, value / column.scale, timestamp))
+
+        return readings
+
+    def size(self):
+        """
+        Return the number of bytes used by encoded readings.
+
+        :returns: size
+        :rtype: int
+        """
+        return self._size
+
+    def empty(self):
+        """
+        Check if the store holds no readings.
+
+        :returns: empty
+        :rtype: bool
+        """
+        return self._size == 0
@@ -0,0 +1,327 @@
+"""Chunked file transfer with a sliding acknowledgement window."""
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import threading
+import timers
+
+# Transfer states reported to the sender
+FILE_TRANSFER = "FILE_TRANSFER"
+FILE_READY = "FILE_READY"
+ERROR = "ERROR"
+ABORTED = "ABORTED"
+
+# Errors reported with the ERROR state
+RETRY_COUNT_EXCEEDED = "RETRY_COUNT_EXCEEDED"
+UNSUPPORTED_FILE_SIZE = "UNSUPPORTED_FILE_SIZE"
+FILE_SYSTEM_ERROR = "FILE_SYSTEM_ERROR"
+FILE_HASH_MISMATCH = "FILE_HASH_MISMATCH"
+MALFORMED_MESSAGE = "MALFORMED_MESSAGE"
+
+_crc_table = None
+
+
+def crc32(data, crc=0):
+    """
+    Compute the CRC-32 (IEEE 802.3) of data.
+
+    :param data: Bytes to checksum
+    :type data: bytes or memoryview
+    :param crc: CRC of the preceding data, to checksum in parts
+    :type crc: int
+    :returns: crc
+    :rtype: int
+    """
+    global _crc_table
+    if _crc_table is None:
+        _crc_table = []
+        for byte in range(256):
+            value = byte
+            for _ in range(8):
+                if value & 1:
+                    value = (value >> 1) ^ 0xEDB88320
+                else:
+                    value >>= 1
+            _crc_table.append(value)
+
+    crc ^= 0xFFFFFFFF
+    for byte in data:
+        crc = _crc_table[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+    return crc ^ 0xFFFFFFFF
+
+
+class FileTransfer:
+    """
+    Receive a file in chunks.
+
+    The device acknowledges chunks cumulatively by requesting the next one
+    it expects, which allows the sender to have up to window chunks in
+    flight. Chunks are checked against their CRC and written in order, so
+    a chunk that is corrupt, lost or out of order makes the device request
+    again from the first missing chunk. A transfer of a partially stored
+    file with the same CRC-32 resumes after its last complete chunk, and
+    the whole stored file is read back and checked against the CRC-32
+    before it is reported ready.
+    """
+
+    def __init__(
+        self, writer, window=4, chunk_timeout_ms=5000, max_retries=3, max_size=None
+    ):
+        """
+        Configure file transfer.
+
+        :param writer: Stores received chunks
+        :type writer: FileWriter
+        :param window: Number of chunks the sender may have in flight
+        :type window: int
+        :param chunk_timeout_ms: Time to wait for a chunk before requesting it again
+        :type chunk_timeout_ms: int
+        :param max_retries: Number of times a chunk is requested again before giving up
+        :type max_retries: int
+        :param max_size: (optional) Largest file accepted, in bytes
+        :type max_size: int or None
+        """
+        self.writer = writer
+        self.window = window
+        self.chunk_timeout_ms = chunk_timeout_ms
+        self.max_retries = max_retries
+        self.max_size = max_size
+        self.name = None
+        self.size = 0
+        self.chunk_size = 0
+        self.digest = 0
+        self.next_chunk = 0
+        self.retries = 0
+        self._last_activity = 0
+        self._rerequested = False
+        self._lock = threading.Lock()
+        self._request_chunks = None
+        self._report_status = None
+
+    def set_listeners(self, request_chunks, report_status):
+        """
+        Set the callbacks sending requests and status to the sender.
+
+        :param request_chunks: Called with name, first chunk index and window
+        :type request_chunks: Callable[[str, int, int], None]
+        :param report_status: Called with name, state and error or None
+        :type report_status: Callable[[str, str, str], None]
+        """
+        self._request_chunks = request_chunks
+        self._report_status = report_status
+
+    def active(self):
+        """
+        Return whether a transfer is in progress.
+
+        :returns: active
+        :rtype: bool
+        """
+        return self.name is not None
+
+    def chunk_count(self):
+        """
+        Return the number of chunks of the current file.
+
+        :returns: count
+        :rtype: int
+        """
+        return (self.size + self.chunk_size - 1) // self.chunk_size
+
+    def start(self, name, size, chunk_size, digest):
+        """
+        Start receiving a file, resuming it if part of it is already stored.
+
+        A transfer already in progress is closed and can be resumed later.
+
+        :param name: Name of the file
+        :type name: str
+        :param size: Size of the file in bytes
+        :type size: int
+        :param chunk_size: Size of every chunk but the last in bytes
+        :type chunk_size: int
+        :param digest: CRC-32 of the whole file
+        :type digest: int
+        """
+        self._lock.acquire()
+        try:
+            if self.name is not None:
+                self.writer.close(False)
+                self.name = None
+
+            if chunk_size <= 0 or (self.max_size is not None and size > self.max_size):
+                self._report_status(name, ERROR, UNSUPPORTED_FILE_SIZE)
+                return
+
+            self.size = size
+            self.chunk_size = chunk_size
+            self.digest = digest
+            stored = self.writer.stored(name, digest)
+            if stored > size:
+                stored = 0
+            self.next_chunk = stored // chunk_size
+            try:
+                self.writer.open(name, size, self.next_chunk * chunk_size, digest)
+            except Exception:
+                self._report_status(name, ERROR, FILE_SYSTEM_ERROR)
+                return
+
+            self.name = name
+            self.retries = 0
+            self._rerequested = False
+            self._last_activity = timers.now()
+            self._report_status(name, FILE_TRANSFER, None)
+            if self.next_chunk >= self.chunk_count():
+                self._finish()
+            else:
+                self._request_chunks(name, self.next_chunk, self.window)
+        finally:
+            self._lock.release()
+
+    def reject(self, name=None):
+        """
+        Report a file transfer request that couldn't be parsed.
+
+        A transfer in progress is not affected.
+
+        :param name: (optional) Name of the file, if it could be read
+        :type name: str or None
+        """
+        self._report_status(name, ERROR, MALFORMED_MESSAGE)
+
+    def reject_chunk(self):
+        """Handle a chunk that couldn't be parsed like a corrupt chunk."""
+        self._lock.acquire()
+        try:
+            if self.name is None:
+                return
+            self._last_activity = timers.now()
+            if not self._rerequested:
+                self._retry()
+        finally:
+            self._lock.release()
+
+    def receive_chunk(self, index, crc, data):
+        """
+        Handle a chunk received from the sender.
+
+        :param index: Index of the chunk
+        :type index: int
+        :param crc: CRC-32 of the chunk data
+        :type crc: int
+        :param data: Chunk data
+        :type data: memoryview
+        """
+        self._lock.acquire()
+        try:
+            if self.name is None or index < self.next_chunk:
+                return
+
+            self._last_activity = timers.now()
+            expected_length = self.chunk_size
+            if index == self.chunk_count() - 1:
+                expected_length = self.size - index * self.chunk_size
+            if (
+                index > self.next_chunk
+                or len(data) != expected_length
+                or crc32(data) != crc
+            ):
+                # Everything sent after a missing chunk is discarded, so the
+                # window is requested again once rather than for every chunk
+                if not self._rerequested:
+                    self._retry()
+                return
+
+            try:
+                self.writer.write(data)
+            except Exception:
+                self._fail(FILE_SYSTEM_ERROR)
+                return
+
+            self.next_chunk += 1
+            self.retries = 0
+            self._rerequested = False
+            if self.next_chunk >= self.chunk_count():
+                self._finish()
+            else:
+                self._request_chunks(self.name, self.next_chunk, self.window)
+        finally:
+            self._lock.release()
+
+    def abort(self):
+        """Abort the transfer in progress and remove what was stored of the file."""
+        self._lock.acquire()
+        try:
+            if self.name is None:
+                return
+            name = self.name
+            self.name = None
+            self.writer.close(False)
+            self.writer.remove(name)
+            self._report_status(name, ABORTED, None)
+        finally:
+            self._lock.release()
+
+    def check(self):
+        """Request the next chunk again if it didn't arrive in time."""
+        self._lock.acquire()
+        try:
+            if self.name is None:
+                return
+            if timers.now() - self._last_activity >= self.chunk_timeout_ms:
+                self._last_activity = timers.now()
+                self._retry()
+        finally:
+            self._lock.release()
+
+    def _retry(self):
+        self.retries += 1
+        if self.retries > self.max_retries:
+            self._fail(RETRY_COUNT_EXCEEDED)
+            return
+        self._rerequested = True
+        self._request_chunks(self.name, self.next_chunk, self.window)
+
+    def _fail(self, error):
+        # What was written is kept, so the transfer can be resumed
+        name = self.name
+        self.name = None
+        self.writer.close(False)
+        self._report_status(name, ERROR, error)
+
+    def _finish(self):
+        try:
+            valid = self._verify()
+        except Exception:
+            self._fail(FILE_SYSTEM_ERROR)
+            return
+
+        name = self.name
+        self.name = None
+        if not valid:
+            # The stored content is wrong, so it can't be resumed either
+            self.writer.close(False)
+            self.writer.remove(name)
+            self._report_status(name, ERROR, FILE_HASH_MISMATCH)
+            return
+        self.writer.close(True)
+        self._report_status(name, FILE_READY, None)
+
+    def _verify(self):
+        crc = 0
+        offset = 0
+        while offset < self.size:
+            length = min(self.chunk_size, self.size - offset)
+            crc = crc32(self.writer.read(self.name, offset, length), crc)
+            offset += length
+        return crc == self.digest
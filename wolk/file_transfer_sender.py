@@ -0,0 +1,234 @@
+"""Local sender for the chunked file transfer of this library."""
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import json
+
+from wolkabout.iot.wolk import file_transfer
+from wolkabout.iot.wolk import wolkabout_protocol_message_deserializer as wapmd
+from wolkabout.iot.wolk import wolkabout_protocol_message_factory as wapmf
+from wolkabout.iot.wolk.interface import file_writer
+
+_INBOUND = wapmd.WolkAboutProtocolMessageDeserializer
+_OUTBOUND = wapmf.WolkAboutProtocolMessageFactory
+
+
+class MemoryFileWriter(file_writer.FileWriter):
+    """Keep received files in RAM, for testing only."""
+
+    def __init__(self):
+        """Create a writer without files."""
+        self.files = {}
+        self.complete = {}
+        self.digests = {}
+        self._name = None
+
+    def stored(self, name, digest):
+        """
+        Return how many bytes of a file with the given digest are stored.
+
+        :param name: Name of the file
+        :type name: str
+        :param digest: CRC-32 of the whole file
+        :type digest: int
+        :returns: number of bytes
+        :rtype: int
+        """
+        if name not in self.files or self.digests.get(name) != digest:
+            return 0
+        return len(self.files[name])
+
+    def open(self, name, size, offset, digest):
+        """
+        Prepare to write a file starting at offset.
+
+        :param name: Name of the file
+        :type name: str
+        :param size: Size of the whole file in bytes
+        :type size: int
+        :param offset: Position of the first byte that will be written
+        :type offset: int
+        :param digest: CRC-32 of the whole file
+        :type digest: int
+        """
+        if name not in self.files:
+            self.files[name] = bytearray()
+        self.files[name] = self.files[name][:offset]
+        self.complete[name] = False
+        self.digests[name] = digest
+        self._name = name
+
+    def read(self, name, offset, length):
+        """
+        Read back part of a file.
+
+        :param name: Name of the file
+        :type name: str
+        :param offset: Position of the first byte
+        :type offset: int
+        :param length: Number of bytes
+        :type length: int
+        :returns: data
+        :rtype: bytes
+        """
+        return bytes(self.files[name][offset : offset + length])
+
+    def write(self, data):
+        """
+        Append a chunk to the open file.
+
+        :param data: Received chunk
+        :type data: memoryview
+        """
+        self.files[self._name].extend(data)
+
+    def close(self, complete):
+        """
+        Close the open file.
+
+        :param complete: True if the whole file was received
+        :type complete: bool
+        """
+        self.complete[self._name] = complete
+        self._name = None
+
+    def remove(self, name):
+        """
+        Delete a file.
+
+        :param name: Name of the file
+        :type name: str
+        """
+        self.files.pop(name, None)
+        self.complete.pop(name, None)
+        self.digests.pop(name, None)
+
+
+class FileTransferSender:
+    """
+    Send a file to a device over a FakeBroker, for local testing.
+
+    Chunks are sent as the device requests them, up to the window it
+    allows. A repeated request for the same chunk is taken as a sign
+    that chunks were lost, and everything from that chunk is sent again.
+    """
+
+    def __init__(self, broker, device_key, corrupt_chunks=None):
+        """
+        Create a sender for one device.
+
+        :param broker: Broker the device is connected to
+        :type broker: FakeBroker
+        :param device_key: Key of the device
+        :type device_key: str
+        :param corrupt_chunks: (optional) Indices of chunks whose first
+            transmission is corrupted, to exercise retries
+        :type corrupt_chunks: List[int] or None
+        """
+        self.broker = broker
+        self.device_key = device_key
+        self.corrupt_chunks = set(corrupt_chunks) if corrupt_chunks else set()
+        self.name = None
+        self.data = None
+        self.chunk_size = 0
+        self.sent_chunks = 0
+        self.statuses = []
+        self._sent_up_to = 0
+        self._last_request = None
+        self._seen = len(broker.published)
+
+    def send(self, name, data, chunk_size=256):
+        """
+        Start sending a file.
+
+        :param name: Name of the file
+        :type name: str
+        :param data: Content of the file
+        :type data: bytes
+        :param chunk_size: Size of every chunk but the last in bytes
+        :type chunk_size: int
+        """
+        self.name = name
+        self.data = data
+        self.chunk_size = chunk_size
+        self._sent_up_to = 0
+        self._last_request = None
+        self.broker.inject(
+            _INBOUND.FILE_UPLOAD_INITIATE + "d/" + self.device_key,
+            json.dumps(
+                {
+                    "fileName": name,
+                    "fileSize": len(data),
+                    "chunkSize": chunk_size,
+                    "fileCrc": file_transfer.crc32(data),
+                }
+            ),
+        )
+
+    def abort(self):
+        """Abort the transfer."""
+        self.broker.inject(_INBOUND.FILE_UPLOAD_ABORT + "d/" + self.device_key, "")
+
+    def status(self):
+        """
+        Return the last state reported by the device.
+
+        :returns: state, e.g. FILE_READY, or None
+        :rtype: str or None
+        """
+        if not self.statuses:
+            return None
+        return self.statuses[-1]["status"]
+
+    def poll(self):
+        """Answer requests and record statuses published since the last poll."""
+        if self._seen > len(self.broker.published):
+            self._seen = 0
+
+        request_topic = _OUTBOUND.FILE_BINARY_REQUEST + "d/" + self.device_key
+        status_topic = _OUTBOUND.FILE_UPLOAD_STATUS + "d/" + self.device_key
+        while self._seen < len(self.broker.published):
+            published_at, topic, payload = self.broker.published[self._seen]
+            self._seen += 1
+            if topic == status_topic:
+                self.statuses.append(json.loads(payload))
+            elif topic == request_topic:
+                request = json.loads(payload)
+                if request["fileName"] == self.name:
+                    self._on_request(request["chunkIndex"], request["window"])
+
+    def _on_request(self, chunk, window):
+        if chunk == self._last_request or chunk > self._sent_up_to:
+            self._sent_up_to = chunk
+        self._last_request = chunk
+
+        count = (len(self.data) + self.chunk_size - 1) // self.chunk_size
+        while self._sent_up_to < min(chunk + window, count):
+            self._send_chunk(self._sent_up_to)
+            self._sent_up_to += 1
+
+    def _send_chunk(self, index):
+        data = self.data[index * self.chunk_size : (index + 1) * self.chunk_size]
+        crc = file_transfer.crc32(data)
+        payload = bytearray(8)
+        for i in range(4):
+            payload[3 - i] = (index >> (8 * i)) & 0xFF
+            payload[7 - i] = (crc >> (8 * i)) & 0xFF
+        payload.extend(data)
+        if index in self.corrupt_chunks:
+            self.corrupt_chunks.remove(index)
+            payload[-1] ^= 0xFF
+        self.sent_chunks += 1
+        self.broker.inject(
+            _INBOUND.FILE_BINARY_RESPONSE + "d/" + self.device_key, bytes(payload)
+        )
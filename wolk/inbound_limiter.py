@@ -0,0 +1,177 @@
+"""Protection against floods of inbound messages."""
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import threading
+import timers
+
+# "Enum" of drop policies applied when the inbound buffer is full
+DROP_NEWEST = "drop_newest"
+DROP_OLDEST = "drop_oldest"
+
+
+def _topic_kind(topic):
+    # "p2d/actuator_set/d/<key>/r/<reference>" -> "p2d/actuator_set/"
+    first = topic.find("/")
+    second = topic.find("/", first + 1)
+    if second < 0:
+        return topic[: first + 1]
+    return topic[: second + 1]
+
+
+class _TokenBucket:
+    """Allow rate events per second with bursts of up to burst events."""
+
+    __slots__ = ("rate", "burst", "tokens", "last_refill")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last_refill = now
+
+    def take(self, now):
+        self.tokens = min(
+            self.burst, self.tokens + (now - self.last_refill) * self.rate / 1000
+        )
+        self.last_refill = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class InboundLimiter:
+    """
+    Rate limit inbound messages and buffer them for deferred handling.
+
+    Every message first has to pass a token bucket for its kind of topic
+    (actuation, configuration, keep alive, ...) and, for messages addressed
+    to a reference, a token bucket for that reference. Buckets are never
+    created for arbitrary topics, so references must be validated by the
+    caller before offering a message. Accepted messages are kept in a bounded buffer that is
+    drained by the application side at its own pace, so a flood only
+    costs a few comparisons per message on the receiving thread.
+    """
+
+    def __init__(
+        self,
+        buffer_size=8,
+        topic_rate=5,
+        topic_burst=10,
+        reference_rate=2,
+        reference_burst=4,
+        drop_policy=DROP_NEWEST,
+    ):
+        """
+        Configure limits of the inbound traffic.
+
+        :param buffer_size: Number of accepted messages awaiting handling
+        :type buffer_size: int
+        :param topic_rate: Messages per second allowed for a single kind of topic
+        :type topic_rate: float
+        :param topic_burst: Messages allowed for a single kind of topic at once
+        :type topic_burst: int
+        :param reference_rate: Messages per second allowed for a single reference
+        :type reference_rate: float
+        :param reference_burst: Messages allowed for a single reference at once
+        :type reference_burst: int
+        :param drop_policy: DROP_NEWEST or DROP_OLDEST when the buffer is full
+        :type drop_policy: str
+        """
+        self.buffer_size = buffer_size
+        self.topic_rate = topic_rate
+        self.topic_burst = topic_burst
+        self.reference_rate = reference_rate
+        self.reference_burst = reference_burst
+        self.drop_policy = drop_policy
+        self._topic_buckets = {}
+        self._reference_buckets = {}
+        self._buffer = []
+        self._lock = threading.Lock()
+        self.received = 0
+        self.rate_limited = 0
+        self.overflowed = 0
+        self.handled = 0
+
+    def offer(self, message, reference=None):
+        """
+        Accept a message for handling if it is within the limits.
+
+        :param message: Received message
+        :type message: Message
+        :param reference: (optional) Valid reference the message is addressed to
+        :type reference: str or None
+        :returns: True if the message was buffered
+        :rtype: bool
+        """
+        now = timers.now()
+        self._lock.acquire()
+        self.received += 1
+
+        kind = _topic_kind(message.topic)
+        bucket = self._topic_buckets.get(kind)
+        if bucket is None:
+            bucket = _TokenBucket(self.topic_rate, self.topic_burst, now)
+            self._topic_buckets[kind] = bucket
+        accepted = bucket.take(now)
+
+        if accepted and reference is not None:
+            bucket = self._reference_buckets.get(reference)
+            if bucket is None:
+                bucket = _TokenBucket(self.reference_rate, self.reference_burst, now)
+                self._reference_buckets[reference] = bucket
+            accepted = bucket.take(now)
+
+        if not accepted:
+            self.rate_limited += 1
+        elif len(self._buffer) < self.buffer_size:
+            self._buffer.append(message)
+        elif self.drop_policy == DROP_OLDEST:
+            self._buffer.pop(0)
+            self._buffer.append(message)
+            self.overflowed += 1
+        else:
+            self.overflowed += 1
+            accepted = False
+
+        self._lock.release()
+        return accepted
+
+    def poll(self):
+        """
+        Take the oldest buffered message.
+
+        :returns: message
+        :rtype: Message or None
+        """
+        self._lock.acquire()
+        message = self._buffer.pop(0) if self._buffer else None
+        if message is not None:
+            self.handled += 1
+        self._lock.release()
+        return message
+
+    def statistics(self):
+        """
+        Return counters of inbound traffic.
+
+        :returns: received, rate_limited, overflowed and handled message counts
+        :rtype: dict
+        """
+        return {
+            "received": self.received,
+            "rate_limited": self.rate_limited,
+            "overflowed": self.overflowed,
+            "handled": self.handled,
+        }
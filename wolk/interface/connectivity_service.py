@@ -47,6 +47,19 @@ class ConnectivityService:
         """
         pass
 
+    def publish_buffer(self, topic, payload):
+        """
+        Publish an already encoded message to the Platform.
+
+        :param topic: Encoded topic
+        :type topic: memoryview
+        :param payload: Encoded payload
+        :type payload: memoryview
+        :returns: success
+        :rtype: bool
+        """
+        pass
+
     def set_inbound_message_listener(self, listener):
         """
         Set a callback to Wolk._on_inbound_message method.
@@ -56,3 +69,12 @@ class ConnectivityService:
         :type listener: Callable
         """
         pass
+
+    def set_connection_listener(self, listener):
+        """
+        Set a callback to be called whenever the connection is (re)established.
+
+        :param listener: connection listener function
+        :type listener: Callable
+        """
+        pass
@@ -0,0 +1,98 @@
+"""File Writer Interface."""
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+
+class FileWriter:
+    """
+    File Writer Interface.
+
+    Stores received file chunks as they arrive, e.g. on flash,
+    so a file never has to fit in RAM.
+    """
+
+    def stored(self, name, digest):
+        """
+        Return how many bytes of a file are already stored from an earlier transfer.
+
+        Only a transfer of the same content counts, so 0 is returned when the
+        file was opened with a different digest.
+
+        :param name: Name of the file
+        :type name: str
+        :param digest: CRC-32 of the whole file
+        :type digest: int
+        :returns: number of bytes
+        :rtype: int
+        """
+        pass
+
+    def open(self, name, size, offset, digest):
+        """
+        Prepare to write a file starting at offset, dropping anything stored after it.
+
+        :param name: Name of the file
+        :type name: str
+        :param size: Size of the whole file in bytes
+        :type size: int
+        :param offset: Position of the first byte that will be written
+        :type offset: int
+        :param digest: CRC-32 of the whole file, kept with what is stored
+        :type digest: int
+        """
+        pass
+
+    def read(self, name, offset, length):
+        """
+        Read back part of a file, also while it is open.
+
+        :param name: Name of the file
+        :type name: str
+        :param offset: Position of the first byte
+        :type offset: int
+        :param length: Number of bytes
+        :type length: int
+        :returns: data
+        :rtype: bytes
+        """
+        pass
+
+    def write(self, data):
+        """
+        Append a chunk to the open file.
+
+        The buffer is only valid during the call.
+
+        :param data: Received chunk
+        :type data: memoryview
+        """
+        pass
+
+    def close(self, complete):
+        """
+        Close the open file, keeping what was written.
+
+        :param complete: True if the whole file was received
+        :type complete: bool
+        """
+        pass
+
+    def remove(self, name):
+        """
+        Delete a file and everything stored of it.
+
+        :param name: Name of the file
+        :type name: str
+        """
+        pass
@@ -91,3 +91,61 @@ class MessageDeserializer:
         :rtype: int
         """
         pass
+
+    def is_file_upload_initiate(self, message):
+        """
+        Check if message starts a file transfer.
+
+        :param message: The message received
+        :type message: Message
+        :returns: file_upload_initiate
+        :rtype: bool
+        """
+        pass
+
+    def is_file_binary_response(self, message):
+        """
+        Check if message is a file chunk.
+
+        :param message: The message received
+        :type message: Message
+        :returns: file_binary_response
+        :rtype: bool
+        """
+        pass
+
+    def is_file_upload_abort(self, message):
+        """
+        Check if message aborts a file transfer.
+
+        :param message: The message received
+        :type message: Message
+        :returns: file_upload_abort
+        :rtype: bool
+        """
+        pass
+
+    def parse_file_upload_initiate(self, message):
+        """
+        Deserialize the name, size, chunk size and CRC-32 of a file to be received.
+
+        :param message: The message received
+        :type message: Message
+        :returns: (name, size, chunk_size, digest) or None if the payload is malformed
+        :rtype: tuple or None
+        """
+        pass
+
+    def parse_file_binary_response(self, message):
+        """
+        Deserialize a file chunk without copying its data.
+
+        The payload is a 4 byte big endian chunk index and a 4 byte big endian
+        CRC-32 of the data, followed by the data.
+
+        :param message: The message received
+        :type message: Message
+        :returns: (index, crc, data) or None if the payload is shorter than the header
+        :rtype: tuple or None
+        """
+        pass
@@ -17,6 +17,17 @@
 class MessageFactory:
     """Message Factory Interface."""
 
+    def set_number_format(self, reference, number_format):
+        """
+        Format numeric values of a sensor with the given precision.
+
+        :param reference: The reference of the sensor
+        :type reference: str
+        :param number_format: Format to use, None restores the default
+        :type number_format: NumberFormat or None
+        """
+        pass
+
     def make_from_sensor_reading(self, reading):
         """
         Serialize a sensor reading to be sent to the Platform.
@@ -28,6 +39,43 @@ class MessageFactory:
         """
         pass
 
+    def encode_sensor_reading(self, reading, buffer):
+        """
+        Encode a sensor reading directly into a preallocated buffer.
+
+        :param reading: The reading to be serialized
+        :type reading: SensorReading
+        :param buffer: Buffer to encode into
+        :type buffer: OutboundBuffer
+        :returns: (topic, payload) views into the buffer or None
+        :rtype: tuple or None
+        """
+        pass
+
+    def make_from_sensor_readings(self, readings):
+        """
+        Serialize multiple sensor readings to be sent to the Platform.
+
+        :param readings: Tuples of (reference, value) or (reference, value, timestamp)
+        :type readings: Iterable[tuple]
+        :returns: messages
+        :rtype: List[Message]
+        """
+        pass
+
+    def make_from_sensor_snapshot(self, readings, timestamp=None):
+        """
+        Serialize readings of multiple sensors sampled at the same time.
+
+        :param readings: Dictionary of sensor reference to reading value
+        :type readings: dict
+        :param timestamp: Unix timestamp shared by all readings
+        :type timestamp: int
+        :returns: messages
+        :rtype: List[Message]
+        """
+        pass
+
     def make_from_alarm(self, alarm):
         """
         Serialize an alarm event to be sent to the Platform.
@@ -39,6 +87,17 @@ class MessageFactory:
         """
         pass
 
+    def make_from_alarms(self, alarms):
+        """
+        Serialize multiple alarm events to be sent to the Platform.
+
+        :param alarms: Tuples of (reference, active) or (reference, active, timestamp)
+        :type alarms: Iterable[tuple]
+        :returns: messages
+        :rtype: List[Message]
+        """
+        pass
+
     def make_from_actuator_status(self, actuator):
         """
         Serialize an actuator status to be sent to the Platform.
@@ -59,6 +118,36 @@ class MessageFactory:
         """
         pass
 
+    def make_file_chunk_request(self, name, chunk, window):
+        """
+        Serialize a request for file chunks, acknowledging all chunks before it.
+
+        :param name: Name of the file
+        :type name: str
+        :param chunk: Index of the first requested chunk
+        :type chunk: int
+        :param window: Number of chunks that may be sent
+        :type window: int
+        :returns: message
+        :rtype: Message
+        """
+        pass
+
+    def make_from_file_transfer_status(self, name, state, error=None):
+        """
+        Serialize the state of a file transfer.
+
+        :param name: Name of the file
+        :type name: str
+        :param state: State of the transfer, e.g. FILE_READY
+        :type state: str
+        :param error: (optional) Reason of the ERROR state
+        :type error: str or None
+        :returns: message
+        :rtype: Message
+        """
+        pass
+
     def make_from_configuration(self, configuration):
         """
         Serialize the device's configuration to be sent to the Platform.
@@ -69,3 +158,27 @@ class MessageFactory:
         :rtype: Message
         """
         pass
+
+    def make_configuration_snapshot(self, configuration):
+        """
+        Serialize configuration values into a new dictionary.
+
+        :param configuration: The device's current configuration
+        :type configuration: dict
+        :returns: snapshot
+        :rtype: dict
+        """
+        pass
+
+    def make_from_configuration_snapshot(self, snapshot, previous=None):
+        """
+        Serialize a configuration snapshot, optionally only changed references.
+
+        :param snapshot: Snapshot of the device's current configuration
+        :type snapshot: dict
+        :param previous: Last snapshot acknowledged by the Platform
+        :type previous: dict or None
+        :returns: message, or None if nothing changed
+        :rtype: Message or None
+        """
+        pass
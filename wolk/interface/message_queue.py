@@ -23,6 +23,19 @@ class MessageQueue:
 
         :param message: Message to be stored
         :type message: Message
+        :returns: True if stored, False otherwise
+        :rtype: bool
+        """
+        pass
+
+    def put_all(self, messages):
+        """
+        Place multiple messages into storage in a single operation.
+
+        :param messages: Messages to be stored
+        :type messages: List[Message]
+        :returns: number of stored messages
+        :rtype: int
         """
         pass
 
@@ -35,6 +48,17 @@ class MessageQueue:
         """
         pass
 
+    def pop(self, message):
+        """
+        Remove the first message from the queue if it is the given message.
+
+        :param message: Message returned by peek
+        :type message: Message
+        :returns: True if removed
+        :rtype: bool
+        """
+        pass
+
     def peek(self):
         """
         Get a message from storage but not remove it.
@@ -43,3 +67,36 @@ class MessageQueue:
         :rtype: Message
         """
         pass
+
+    def size(self):
+        """
+        Return the number of stored messages.
+
+        :returns: size
+        :rtype: int
+        """
+        pass
+
+    def usage(self):
+        """
+        Return the total size of stored messages in bytes.
+
+        :returns: usage
+        :rtype: int
+        """
+        pass
+
+    def set_watermarks(self, high, low, on_high, on_low):
+        """
+        Set occupancy levels at which the producer is notified.
+
+        :param high: Number of messages that triggers on_high
+        :type high: int
+        :param low: Number of messages that triggers on_low after high
+        :type low: int
+        :param on_high: Called with the current size when high is reached
+        :type on_high: Callable[[int], None]
+        :param on_low: Called with the current size when low is reached
+        :type on_low: Callable[[int], None]
+        """
+        pass
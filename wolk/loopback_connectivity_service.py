@@ -0,0 +1,345 @@
+"""In-process connectivity service and broker for testing without network."""
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import json
+
+from wolkabout.iot.wolk.interface import connectivity_service
+from wolkabout.iot.wolk.model import message
+
+
+class FakeBroker:
+    """
+    Minimal broker living in the same process as its clients.
+
+    Time is virtual: nothing is delivered until advance() moves the
+    clock, which makes load tests deterministic and independent of the
+    speed of the machine running them. Loss is drawn from a seeded
+    pseudo-random sequence for the same reason.
+    """
+
+    def __init__(self, latency_ms=0, loss_rate=0.0, seed=1, respond_to_ping=True):
+        """
+        Create a broker without clients.
+
+        :param latency_ms: Delay of every message in each direction
+        :type latency_ms: int
+        :param loss_rate: Probability that a message is lost, 0.0 to 1.0
+        :type loss_rate: float
+        :param seed: Seed of the loss sequence
+        :type seed: int
+        :param respond_to_ping: Answer ping messages with pong messages
+        :type respond_to_ping: bool
+        """
+        self.latency_ms = latency_ms
+        self.loss_rate = loss_rate
+        self.respond_to_ping = respond_to_ping
+        self.clock = 0
+        self.published = []
+        self.lost = 0
+        self._random_state = seed
+        self._clients = []
+        self._pending = []
+        self._reconnect_at = None
+
+    def _random(self):
+        self._random_state = (self._random_state * 1103515245 + 12345) % 2147483648
+        return self._random_state / 2147483648
+
+    def _is_lost(self):
+        if self.loss_rate > 0 and self._random() < self.loss_rate:
+            self.lost += 1
+            return True
+        return False
+
+    def attach(self, client):
+        """
+        Connect a client to the broker.
+
+        :param client: Client to connect
+        :type client: LoopbackConnectivityService
+        """
+        if client not in self._clients:
+            self._clients.append(client)
+
+    def detach(self, client):
+        """
+        Disconnect a client from the broker.
+
+        :param client: Client to disconnect
+        :type client: LoopbackConnectivityService
+        """
+        if client in self._clients:
+            self._clients.remove(client)
+
+    def receive(self, client, topic, payload):
+        """
+        Accept a message published by a client.
+
+        :param client: Publishing client
+        :type client: LoopbackConnectivityService
+        :param topic: Topic of the message
+        :type topic: str
+        :param payload: Payload of the message
+        :type payload: str or None
+        :returns: False if the message was lost
+        :rtype: bool
+        """
+        if client not in self._clients or self._is_lost():
+            return False
+
+        self.published.append((self.clock + self.latency_ms, topic, payload))
+
+        if self.respond_to_ping and topic.startswith("ping/"):
+            self.inject(
+                "pong/" + topic[len("ping/") :],
+                json.dumps({"value": self.clock + self.latency_ms}),
+            )
+        return True
+
+    def inject(self, topic, payload):
+        """
+        Send a message to every subscribed client after the latency.
+
+        :param topic: Topic of the message
+        :type topic: str
+        :param payload: Payload of the message
+        :type payload: str or bytes
+        """
+        if isinstance(payload, str):
+            payload = payload.encode()
+        self._pending.append((self.clock + self.latency_ms, topic, payload))
+
+    def inject_actuation(self, device_key, reference, value):
+        """
+        Send an actuation command as the Platform would.
+
+        :param device_key: Key of the device
+        :type device_key: str
+        :param reference: Reference of the actuator
+        :type reference: str
+        :param value: Value to set
+        :type value: bool or int or float or str
+        """
+        if value is True:
+            value = "true"
+        elif value is False:
+            value = "false"
+        self.inject(
+            "p2d/actuator_set/d/" + device_key + "/r/" + reference,
+            json.dumps({"value": str(value)}),
+        )
+
+    def inject_configuration(self, device_key, configuration):
+        """
+        Send a configuration command as the Platform would.
+
+        :param device_key: Key of the device
+        :type device_key: str
+        :param configuration: Configuration reference to value
+        :type configuration: dict
+        """
+        values = {}
+        for reference, value in configuration.items():
+            if value is True:
+                value = "true"
+            elif value is False:
+                value = "false"
+            values[reference] = str(value)
+        self.inject("p2d/configuration_set/d/" + device_key, json.dumps(values))
+
+    def inject_pong(self, device_key, timestamp):
+        """
+        Send a keep alive response as the Platform would.
+
+        :param device_key: Key of the device
+        :type device_key: str
+        :param timestamp: UTC timestamp in milliseconds
+        :type timestamp: int
+        """
+        self.inject("pong/" + device_key, json.dumps({"value": timestamp}))
+
+    def drop_connections(self, duration_ms):
+        """
+        Disconnect all clients and let them reconnect after duration_ms.
+
+        :param duration_ms: Length of the outage in virtual milliseconds
+        :type duration_ms: int
+        """
+        for client in self._clients:
+            client.connection_lost()
+        self._reconnect_at = self.clock + duration_ms
+
+    def advance(self, ms):
+        """
+        Move the virtual clock and deliver messages that became due.
+
+        :param ms: Number of milliseconds to advance
+        :type ms: int
+        """
+        self.clock += ms
+
+        if self._reconnect_at is not None and self.clock >= self._reconnect_at:
+            self._reconnect_at = None
+            for client in self._clients:
+                client.connection_restored()
+
+        due = []
+        remaining = []
+        for pending in self._pending:
+            if pending[0] <= self.clock:
+                due.append(pending)
+            else:
+                remaining.append(pending)
+        self._pending = remaining
+
+        for deliver_at, topic, payload in due:
+            if self._is_lost():
+                continue
+            for client in self._clients:
+                client.deliver(topic, payload)
+
+    def clear(self):
+        """Forget all recorded published messages."""
+        self.published = []
+
+
+class LoopbackConnectivityService(connectivity_service.ConnectivityService):
+    """Connectivity service exchanging messages with a FakeBroker."""
+
+    def __init__(self, broker, topics=None):
+        """
+        Create a service for the given broker.
+
+        :param broker: Broker to connect to
+        :type broker: FakeBroker
+        :param topics: (optional) Topics to receive, every topic if not given.
+            A trailing # matches any topic with the preceding prefix
+        :type topics: List[str] or None
+        """
+        self.broker = broker
+        self.topics = topics
+        self._connected = False
+        self._inbound_message_listener = None
+        self._connection_listener = None
+
+    def set_inbound_message_listener(self, listener):
+        """
+        Set the callback method to handle inbound messages.
+
+        :param listener: Method that handles inbound messages
+        :type listener: Callable[[Message], None]
+        """
+        self._inbound_message_listener = listener
+
+    def set_connection_listener(self, listener):
+        """
+        Set the callback method called when the connection is established.
+
+        :param listener: Method to call when the connection is established
+        :type listener: Callable[[], None]
+        """
+        self._connection_listener = listener
+
+    def connect(self):
+        """Connect to the broker."""
+        if self._connected:
+            return
+
+        self.broker.attach(self)
+        self._connected = True
+        if self._connection_listener is not None:
+            self._connection_listener()
+
+    def disconnect(self):
+        """Disconnect from the broker."""
+        self._connected = False
+        self.broker.detach(self)
+
+    def connected(self):
+        """
+        Return the current status of the connection.
+
+        :returns: current connection state
+        :rtype: bool
+        """
+        return self._connected
+
+    def publish(self, outbound_message):
+        """
+        Publish the message to the broker.
+
+        :param outbound_message: Message to be published
+        :type outbound_message: Message
+        :returns: True on success, False otherwise
+        :rtype: bool
+        """
+        if not self._connected:
+            return False
+
+        return self.broker.receive(
+            self, outbound_message.topic, outbound_message.payload
+        )
+
+    def publish_buffer(self, topic, payload):
+        """
+        Publish an encoded message to the broker.
+
+        :param topic: Encoded topic
+        :type topic: memoryview
+        :param payload: Encoded payload
+        :type payload: memoryview
+        :returns: True on success, False otherwise
+        :rtype: bool
+        """
+        if not self._connected:
+            return False
+
+        return self.broker.receive(
+            self, bytes(topic).decode("utf-8"), bytes(payload).decode("utf-8")
+        )
+
+    def connection_lost(self):
+        """Called by the broker when it drops the connection."""
+        self._connected = False
+
+    def connection_restored(self):
+        """Called by the broker when the client would have reconnected."""
+        self._connected = True
+        if self._connection_listener is not None:
+            self._connection_listener()
+
+    def deliver(self, topic, payload):
+        """
+        Pass a message from the broker to the inbound message listener.
+
+        :param topic: Topic of the message
+        :type topic: str
+        :param payload: Payload of the message
+        :type payload: bytes
+        """
+        if not self._connected or self._inbound_message_listener is None:
+            return
+        if self.topics is not None and not self._subscribed(topic):
+            return
+
+        self._inbound_message_listener(message.Message(topic, payload))
+
+    def _subscribed(self, topic):
+        for subscription in self.topics:
+            if subscription.endswith("#"):
+                if topic.startswith(subscription[:-1]):
+                    return True
+            elif subscription == topic:
+                return True
+        return False
@@ -0,0 +1,68 @@
+"""Time-to-live of stored messages."""
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+# Message kinds, as used by WolkAbout protocol topics
+SENSOR_READING = "d2p/sensor_reading/"
+ALARM = "d2p/events/"
+ACTUATOR_STATUS = "d2p/actuator_status/"
+CONFIGURATION = "d2p/configuration_get/"
+
+_REFERENCE_DELIMITER = "/r/"
+
+
+class MessageTtl:
+    """
+    Decide how long a stored message stays worth sending.
+
+    A TTL configured for the reference of a message takes precedence
+    over the TTL of its kind, which takes precedence over the default.
+    """
+
+    def __init__(self, default_ms=None, kind_ms=None, reference_ms=None):
+        """
+        Configure TTLs in milliseconds, None meaning the message never expires.
+
+        :param default_ms: TTL of messages without a more specific TTL
+        :type default_ms: int or None
+        :param kind_ms: Kind (e.g. SENSOR_READING) to TTL
+        :type kind_ms: dict or None
+        :param reference_ms: Reference to TTL
+        :type reference_ms: dict or None
+        """
+        self.default_ms = default_ms
+        self.kind_ms = kind_ms if kind_ms is not None else {}
+        self.reference_ms = reference_ms if reference_ms is not None else {}
+
+    def ttl_ms(self, message):
+        """
+        Return the TTL of a message.
+
+        :param message: Message about to be stored
+        :type message: Message
+        :returns: TTL in milliseconds or None
+        :rtype: int or None
+        """
+        if self.reference_ms:
+            position = message.topic.find(_REFERENCE_DELIMITER)
+            if position >= 0:
+                reference = message.topic[position + len(_REFERENCE_DELIMITER) :]
+                if reference in self.reference_ms:
+                    return self.reference_ms[reference]
+
+        for kind, ttl in self.kind_ms.items():
+            if message.topic.startswith(kind):
+                return ttl
+
+        return self.default_ms
@@ -17,6 +17,8 @@
 class ActuatorStatus:
     """Actuator Status class."""
 
+    __slots__ = ("reference", "state", "value")
+
     def __init__(self, reference, state, value):
         """
         State of a device actuator.
@@ -17,6 +17,8 @@
 class Alarm:
     """Alarm event model."""
 
+    __slots__ = ("reference", "active", "timestamp")
+
     def __init__(self, reference, active, timestamp=None):
         """
         State of a device alarm.
@@ -17,6 +17,8 @@
 class Message:
     """MQTT Message model."""
 
+    __slots__ = ("topic", "payload")
+
     def __init__(self, topic, payload):
         """
         MQTT Message identified by topic and payload.
@@ -17,6 +17,8 @@
 class SensorReading:
     """Sensor reading model."""
 
+    __slots__ = ("reference", "value", "timestamp")
+
     def __init__(self, reference, value, timestamp=None):
         """
         Information about a sensor reading.
@@ -13,7 +13,10 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 from mqtt import mqtt
+import ssl
+import timers
 
+from wolkabout.iot.wolk import broker_endpoints
 from wolkabout.iot.wolk.interface import connectivity_service
 from wolkabout.iot.wolk.model import message
 
@@ -21,7 +24,17 @@ from wolkabout.iot.wolk.model import message
 class MQTTConnectivityService(connectivity_service.ConnectivityService):
     """Provide connection to WolkAbout IoT Platform via MQTT."""
 
-    def __init__(self, device, topics, host, port, qos=0):
+    def __init__(
+        self,
+        device,
+        topics,
+        host,
+        port,
+        qos=0,
+        endpoints=None,
+        tls_ca_cert=None,
+        persistent_session=False,
+    ):
         """
         Credentials and configuration for MQTT connection.
 
@@ -35,14 +48,30 @@ class MQTTConnectivityService(connectivity_service.ConnectivityService):
         :type port: int
         :param qos: Quality of Service for MQTT connection (0,1,2), defaults to 0
         :type qos: int
+        :param endpoints: Brokers to choose from instead of host and port
+        :type endpoints: BrokerEndpoints or None
+        :param tls_ca_cert: PEM certificate of the CA that signed the broker certificate, enables TLS
+        :type tls_ca_cert: str or None
+        :param persistent_session: Ask the broker to keep subscriptions and queued commands while disconnected
+        :type persistent_session: bool
         """
         self.device = device
         self.topics = topics
         self.qos = qos
         self.host = host
         self.port = port
+        if endpoints is None:
+            endpoints = broker_endpoints.BrokerEndpoints([(host, port)])
+        self.endpoints = endpoints
+        self.tls_ca_cert = tls_ca_cert
+        self._ssl_contexts = {}
+        self.persistent_session = persistent_session
+        self._endpoint = None
+        self._reconnect_started = None
+        self._reconnecting = False
         self._connected = False
         self._inbound_message_listener = None
+        self._connection_listener = None
         self._client = None
 
     def set_inbound_message_listener(self, on_inbound_message):
@@ -54,6 +83,17 @@ class MQTTConnectivityService(connectivity_service.ConnectivityService):
         """
         self._inbound_message_listener = on_inbound_message
 
+    def set_connection_listener(self, on_connected):
+        """
+        Set the callback method called once subscriptions are in place.
+
+        It is called after the initial connection and after every reconnect.
+
+        :param on_connected: Method to call when the connection is established
+        :type on_connected: Callable[[], None]
+        """
+        self._connection_listener = on_connected
+
     def on_mqtt_message(self, client, data):
         """
         Serialize inbound messages and pass them to inbound message listener.
@@ -76,26 +116,99 @@ class MQTTConnectivityService(connectivity_service.ConnectivityService):
         If there are actuators it will subscribe to topics that will contain
         actuator commands and also starts a loop to handle inbound messages.
 
-        Raises an exception if the connection failed.
+        Endpoints are tried in the order given by BrokerEndpoints.candidates.
+        Raises the last exception if connecting to all of them failed.
         """
         if self._connected:
             return
 
-        self._client = mqtt.Client(client_id=self.device.key, clean_session=True)
-        self._client.set_username_pw(self.device.key, self.device.password)
-        self._client.set_will("lastwill/" + self.device.key, "Gone offline", 2, False)
-
-        try:
-            self._client.connect(self.host, keepalive=60, port=self.port)
-            topics = []
-            for topic in self.topics:
-                topics.append([topic, 2])
-            self._client.subscribe(topics)
-            self._client.on(mqtt.PUBLISH, self.on_mqtt_message)
-            self._client.loop()
-            self._connected = True
-        except Exception as e:
-            raise e
+        error = None
+        self._endpoint = None
+        for index in self.endpoints.candidates():
+            self._client = mqtt.Client(
+                client_id=self.device.key, clean_session=not self.persistent_session
+            )
+            self._client.set_username_pw(self.device.key, self.device.password)
+            self._client.set_will(
+                "lastwill/" + self.device.key, "Gone offline", 2, False
+            )
+            try:
+                started = timers.now()
+                self._client.connect(
+                    self.endpoints.address(index),
+                    keepalive=60,
+                    port=self.endpoints.port(index),
+                    ssl_ctx=self._ssl_context(index),
+                    breconnect_cb=self._before_reconnect,
+                    aconnect_cb=self._on_reconnect,
+                )
+                self.endpoints.report_success(index, timers.now() - started)
+                self._endpoint = index
+                break
+            except Exception as e:
+                self.endpoints.report_failure(index)
+                error = e
+
+        if self._endpoint is None:
+            raise error
+
+        self._subscribe()
+        self._client.on(mqtt.PUBLISH, self.on_mqtt_message)
+        self._client.loop()
+        self._reconnecting = False
+        self._connected = True
+
+        if self._connection_listener is not None:
+            self._connection_listener()
+
+    def _subscribe(self):
+        topics = []
+        for topic in self.topics:
+            topics.append([topic, 2])
+        # The client doesn't report the session present flag of CONNACK, so
+        # subscriptions are renewed even when the broker may have kept them
+        self._client.subscribe(topics)
+
+    def _before_reconnect(self, client):
+        # The client reconnects to its host and port, point them at the best endpoint
+        if not self._connected:
+            return
+
+        self._reconnecting = True
+        self.endpoints.report_failure(self._endpoint)
+        self._endpoint = self.endpoints.candidates()[0]
+        client.host = self.endpoints.address(self._endpoint)
+        client.port = self.endpoints.port(self._endpoint)
+        client.ssl_ctx = self._ssl_context(self._endpoint)
+        self._reconnect_started = timers.now()
+
+    def _ssl_context(self, index):
+        # One context per endpoint, created on first use and reused on reconnects
+        if self.tls_ca_cert is None:
+            return None
+        if index not in self._ssl_contexts:
+            self._ssl_contexts[index] = ssl.create_ssl_context(
+                cacert=self.tls_ca_cert,
+                hostname=self.endpoints.hosts[index],
+                options=ssl.CERT_REQUIRED | ssl.SERVER_AUTH,
+            )
+        return self._ssl_contexts[index]
+
+    def _on_reconnect(self, client):
+        # Initial connection is completed by connect()
+        if not self._connected:
+            return
+
+        if self._reconnect_started is not None:
+            self.endpoints.report_success(
+                self._endpoint, timers.now() - self._reconnect_started
+            )
+            self._reconnect_started = None
+
+        self._reconnecting = False
+        self._subscribe()
+        if self._connection_listener is not None:
+            self._connection_listener()
 
     def disconnect(self):
         """Disconnect the device from the Platform."""
@@ -108,10 +221,12 @@ class MQTTConnectivityService(connectivity_service.ConnectivityService):
         """
         Return the current status of the connection.
 
+        The connection counts as down while the client is reconnecting.
+
         :return: current connection state
         :rtype: bool
         """
-        return self._connected
+        return self._connected and not self._reconnecting
 
     def publish(self, message):
         """
@@ -125,3 +240,17 @@ class MQTTConnectivityService(connectivity_service.ConnectivityService):
         """
         self._client.publish(message.topic, message.payload, self.qos)
         return True
+
+    def publish_buffer(self, topic, payload):
+        """
+        Publish an encoded message without converting it to strings.
+
+        :param topic: Encoded topic
+        :type topic: memoryview
+        :param payload: Encoded payload
+        :type payload: memoryview
+        :return: True on success, False otherwise
+        :rtype: bool
+        """
+        self._client.publish(topic, payload, self.qos)
+        return True
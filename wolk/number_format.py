@@ -0,0 +1,114 @@
+"""Precision-controlled formatting of numeric sensor values."""
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+# "Enum" of formatting modes
+DECIMALS = "decimals"
+SIGNIFICANT = "significant"
+SCALED = "scaled"
+
+
+def _is_finite(value):
+    # Infinity minus itself and NaN are both NaN, which is not equal to 0
+    return value - value == 0
+
+
+def _round(value):
+    return int(value + 0.5) if value >= 0 else int(value - 0.5)
+
+
+class NumberFormat:
+    """
+    Format numbers with a fixed precision using integer arithmetic only.
+
+    DECIMALS keeps a fixed number of digits after the decimal point,
+    SIGNIFICANT keeps a number of significant digits, and SCALED sends
+    the value multiplied by a factor as an integer, e.g. centidegrees.
+    """
+
+    def __init__(self, mode=DECIMALS, digits=2, scale=1):
+        """
+        Configure the format.
+
+        :param mode: DECIMALS, SIGNIFICANT or SCALED
+        :type mode: str
+        :param digits: Number of decimals or significant digits
+        :type digits: int
+        :param scale: Factor applied before rounding when using SCALED
+        :type scale: int or float
+        """
+        self.mode = mode
+        self.digits = digits
+        self.scale = scale
+        self._power = 10 ** digits
+
+    def format(self, value):
+        """
+        Format a number.
+
+        Infinity and NaN are not formatted, they are converted with str.
+
+        :param value: Number to format
+        :type value: int or float
+        :returns: formatted number
+        :rtype: str
+        """
+        if not _is_finite(value):
+            return str(value)
+
+        if self.mode == SCALED:
+            return str(_round(value * self.scale))
+
+        if self.mode == SIGNIFICANT:
+            return self._format_significant(value)
+
+        return self._format_decimals(_round(value * self._power), self.digits)
+
+    def _format_decimals(self, scaled, decimals):
+        if decimals <= 0:
+            return str(scaled)
+
+        digits = str(-scaled if scaled < 0 else scaled)
+        if len(digits) <= decimals:
+            digits = "0" * (decimals - len(digits) + 1) + digits
+        split = len(digits) - decimals
+        sign = "-" if scaled < 0 else ""
+        return sign + digits[:split] + "." + digits[split:]
+
+    def _format_significant(self, value):
+        magnitude = -value if value < 0 else value
+        if magnitude == 0:
+            return "0"
+
+        # Number of integer digits, negative for magnitudes below 0.1
+        exponent = 0
+        while magnitude >= 1:
+            magnitude /= 10
+            exponent += 1
+        while magnitude < 0.1:
+            magnitude *= 10
+            exponent -= 1
+
+        decimals = self.digits - exponent
+        if decimals >= 0:
+            scaled = _round(value * 10 ** decimals)
+            # Rounding up to the next power of ten gains a digit, e.g. 9.99 -> 10.0
+            limit = 10 ** self.digits
+            if decimals > 0 and (scaled >= limit or scaled <= -limit):
+                scaled //= 10
+                decimals -= 1
+            return self._format_decimals(scaled, decimals)
+
+        power = 10 ** -decimals
+        return str(_round(value / power) * power)
@@ -0,0 +1,57 @@
+"""Free-list pools for reusing model instances."""
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+
+class ObjectPool:
+    """Keep released instances around so they can be handed out again."""
+
+    def __init__(self, factory, size):
+        """
+        Create a pool and preallocate its instances.
+
+        :param factory: Function returning a new instance
+        :type factory: Callable[[], object]
+        :param size: Maximum number of free instances kept in the pool
+        :type size: int
+        """
+        self.factory = factory
+        self.size = size
+        self._free = []
+        for _ in range(size):
+            self._free.append(factory())
+
+    def acquire(self):
+        """
+        Take an instance from the pool, creating one if the pool is empty.
+
+        :returns: instance
+        :rtype: object
+        """
+        try:
+            return self._free.pop()
+        except IndexError:
+            return self.factory()
+
+    def release(self, instance):
+        """
+        Return an instance to the pool.
+
+        The instance must not be used by the caller afterwards.
+
+        :param instance: Instance previously obtained from acquire
+        :type instance: object
+        """
+        if len(self._free) < self.size:
+            self._free.append(instance)
@@ -0,0 +1,126 @@
+"""Preallocated buffer for encoding outbound messages."""
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+
+class OutboundBuffer:
+    """
+    Reusable bytearray that messages are encoded into.
+
+    Topic and payload are written back to back and handed to the
+    transport as memoryview slices, so no intermediate strings or
+    copies are created per message. The contents are only valid until
+    the next reset, so the buffer must not be shared between threads
+    without locking.
+    """
+
+    def __init__(self, size=256):
+        """
+        Preallocate the buffer.
+
+        :param size: Capacity in bytes of topic and payload together
+        :type size: int
+        """
+        self.data = bytearray(size)
+        self.view = memoryview(self.data)
+        self.length = 0
+
+    def reset(self):
+        """Discard the current contents."""
+        self.length = 0
+
+    def write(self, chunk):
+        """
+        Append bytes to the buffer.
+
+        :param chunk: Bytes to append
+        :type chunk: bytes or bytearray
+        :returns: False if the chunk does not fit
+        :rtype: bool
+        """
+        end = self.length + len(chunk)
+        if end > len(self.data):
+            return False
+        self.data[self.length : end] = chunk
+        self.length = end
+        return True
+
+    def write_ascii(self, text):
+        """
+        Append printable ASCII text that needs no JSON escaping, without encoding it first.
+
+        :param text: Text to append
+        :type text: str
+        :returns: False if the text does not fit or contains other characters
+        :rtype: bool
+        """
+        end = self.length + len(text)
+        if end > len(self.data):
+            return False
+        position = self.length
+        for character in text:
+            code = ord(character)
+            # Quote, backslash and non-printable characters would need escaping
+            if code == 34 or code == 92 or code < 32 or code > 126:
+                return False
+            self.data[position] = code
+            position += 1
+        self.length = end
+        return True
+
+    def write_int(self, number):
+        """
+        Append the decimal digits of an integer without converting it to a string.
+
+        :param number: Integer to append
+        :type number: int
+        :returns: False if the digits do not fit
+        :rtype: bool
+        """
+        digits = 1
+        magnitude = -number if number < 0 else number
+        while magnitude >= 10:
+            magnitude //= 10
+            digits += 1
+        if number < 0:
+            digits += 1
+
+        end = self.length + digits
+        if end > len(self.data):
+            return False
+        magnitude = -number if number < 0 else number
+        position = end - 1
+        while True:
+            self.data[position] = 48 + magnitude % 10
+            magnitude //= 10
+            position -= 1
+            if magnitude == 0:
+                break
+        if number < 0:
+            self.data[self.length] = 45  # -
+        self.length = end
+        return True
+
+    def slice(self, start, end):
+        """
+        Return a view of part of the buffer without copying it.
+
+        :param start: Index of the first byte
+        :type start: int
+        :param end: Index after the last byte
+        :type end: int
+        :returns: view
+        :rtype: memoryview
+        """
+        return self.view[start:end]
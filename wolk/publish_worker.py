@@ -0,0 +1,102 @@
+"""Thread running publishing work signalled from timer wheel callbacks."""
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import threading
+
+
+class _Job:
+    """Callback run by a PublishWorker each time it is signalled."""
+
+    __slots__ = ("worker", "callback", "pending")
+
+    def __init__(self, worker, callback):
+        self.worker = worker
+        self.callback = callback
+        self.pending = False
+
+    def signal(self):
+        """Request the callback to run on the worker thread."""
+        self.worker._signal(self)
+
+
+class PublishWorker:
+    """
+    Run publishing jobs on a thread of their own.
+
+    Timer wheel callbacks only signal a job, so a slow publish never
+    delays sensor samplers or other scheduled tasks. A job signalled
+    again before it ran is run once.
+    """
+
+    def __init__(self):
+        """Create a stopped worker without jobs."""
+        self.error_handler = None
+        self._jobs = []
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._running = False
+
+    def add(self, callback):
+        """
+        Register a job.
+
+        :param callback: Function to run when the job is signalled
+        :type callback: Callable[[], None]
+        :returns: job whose signal method requests a run
+        :rtype: _Job
+        """
+        job = _Job(self, callback)
+        self._lock.acquire()
+        self._jobs.append(job)
+        self._lock.release()
+        return job
+
+    def start(self):
+        """Start the worker thread if it is not already running."""
+        if self._running:
+            return
+
+        self._running = True
+        thread(self._run)  # noqa
+
+    def stop(self):
+        """Stop the worker thread once the running job returns."""
+        self._running = False
+        self._event.set()
+
+    def _signal(self, job):
+        self._lock.acquire()
+        job.pending = True
+        self._lock.release()
+        self._event.set()
+
+    def _run(self):
+        while self._running:
+            self._event.wait()
+            self._event.clear()
+            index = 0
+            while self._running and index < len(self._jobs):
+                self._lock.acquire()
+                job = self._jobs[index]
+                pending = job.pending
+                job.pending = False
+                self._lock.release()
+                index += 1
+                if not pending:
+                    continue
+                try:
+                    job.callback()
+                except Exception as e:
+                    if self.error_handler is not None:
+                        self.error_handler(e)
@@ -0,0 +1,124 @@
+"""Strategies for compacting stored sensor readings when the queue is full."""
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import json
+
+# "Enum" of compaction strategies
+LATEST = "latest"
+DECIMATE = "decimate"
+SUMMARY = "summary"
+
+# "Enum" of summaries
+SUMMARY_MEAN = "mean"
+SUMMARY_MIN = "min"
+SUMMARY_MAX = "max"
+
+
+class QueueCompaction:
+    """
+    Merge stored sensor readings of the same reference.
+
+    Only sensor reading messages are merged, all other messages are kept.
+    The newest reading of every reference always survives, so a full
+    queue loses resolution instead of the most recent data.
+    """
+
+    SENSOR_READING = "d2p/sensor_reading/"
+    REFERENCE_DELIMITER = "/r/"
+
+    def __init__(self, strategy=LATEST, decimation=2, summary=SUMMARY_MEAN):
+        """
+        Configure how stored readings are merged.
+
+        :param strategy: LATEST keeps only the newest reading per reference,
+            DECIMATE keeps every decimation-th reading and SUMMARY replaces
+            the readings with a single min, max or mean value
+        :type strategy: str
+        :param decimation: Keep every n-th reading when using DECIMATE, at least 2
+        :type decimation: int
+        :param summary: SUMMARY_MEAN, SUMMARY_MIN or SUMMARY_MAX
+        :type summary: str
+        """
+        if decimation < 2:
+            raise ValueError
+        self.strategy = strategy
+        self.decimation = decimation
+        self.summary = summary
+
+    def compact(self, messages):
+        """
+        Return the messages that remain after compaction, in original order.
+
+        :param messages: Stored messages, oldest first
+        :type messages: List[Message]
+        :returns: compacted messages
+        :rtype: List[Message]
+        """
+        groups = {}
+        for index in range(len(messages)):
+            topic = messages[index].topic
+            # Only readings of a single reference, grouped by their reference topic
+            if (
+                not topic.startswith(self.SENSOR_READING)
+                or self.REFERENCE_DELIMITER not in topic
+            ):
+                continue
+            if topic in groups:
+                groups[topic].append(index)
+            else:
+                groups[topic] = [index]
+
+        keep = [True] * len(messages)
+        for indices in groups.values():
+            if len(indices) < 2:
+                continue
+            if self.strategy == SUMMARY:
+                # Readings that can't be summarized are left as they are
+                if self._summarize(messages, indices):
+                    for index in indices[:-1]:
+                        keep[index] = False
+            elif self.strategy == DECIMATE:
+                for position in range(len(indices) - 1):
+                    if position % self.decimation != 0:
+                        keep[indices[position]] = False
+            else:
+                for index in indices[:-1]:
+                    keep[index] = False
+
+        compacted = []
+        for index in range(len(messages)):
+            if keep[index]:
+                compacted.append(messages[index])
+        return compacted
+
+    def _summarize(self, messages, indices):
+        values = []
+        for index in indices:
+            payload = json.loads(messages[index].payload)
+            try:
+                values.append(float(payload["data"]))
+            except Exception:
+                return False
+
+        if self.summary == SUMMARY_MIN:
+            value = min(values)
+        elif self.summary == SUMMARY_MAX:
+            value = max(values)
+        else:
+            value = sum(values) / len(values)
+
+        # Keep the timestamp of the newest reading
+        payload["data"] = str(value)
+        messages[indices[-1]].payload = json.dumps(payload)
+        return True
@@ -0,0 +1,156 @@
+"""Hashed timer wheel running periodic tasks on a single thread."""
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import threading
+import timers
+
+
+class _Task:
+    """Scheduled callback."""
+
+    __slots__ = ("ticks", "callback", "periodic", "rounds", "cancelled")
+
+    def __init__(self, ticks, callback, periodic):
+        self.ticks = ticks
+        self.callback = callback
+        self.periodic = periodic
+        self.rounds = 0
+        self.cancelled = False
+
+
+class TimerWheel:
+    """
+    Run many periodic and one-shot tasks from one thread.
+
+    Tasks are hashed into a fixed number of slots by their due tick, so
+    scheduling, cancelling and advancing the wheel by one tick only
+    touch a single slot regardless of how many tasks are registered.
+    Callbacks run on the wheel thread and must not block; blocking work
+    such as publishing belongs on a PublishWorker the callback signals.
+    Exceptions raised by callbacks are passed to error_handler, if set.
+    """
+
+    def __init__(self, tick_ms=100, slots=64):
+        """
+        Create a stopped timer wheel.
+
+        :param tick_ms: Resolution of the wheel in milliseconds
+        :type tick_ms: int
+        :param slots: Number of slots of the wheel
+        :type slots: int
+        """
+        self.tick_ms = tick_ms
+        self._slots = []
+        for _ in range(slots):
+            self._slots.append([])
+        self._current = 0
+        self._running = False
+        self._lock = threading.Lock()
+        self.error_handler = None
+
+    def schedule(self, delay_ms, callback, periodic=True):
+        """
+        Schedule a callback.
+
+        :param delay_ms: Delay before the callback is called, and its period if periodic
+        :type delay_ms: int
+        :param callback: Function to call
+        :type callback: Callable[[], None]
+        :param periodic: Call the callback every delay_ms instead of once
+        :type periodic: bool
+        :returns: task that can be passed to cancel
+        :rtype: _Task
+        """
+        ticks = max(1, (delay_ms + self.tick_ms - 1) // self.tick_ms)
+        task = _Task(ticks, callback, periodic)
+        self._lock.acquire()
+        self._insert(task)
+        self._lock.release()
+        return task
+
+    def cancel(self, task):
+        """
+        Cancel a scheduled task.
+
+        The task is dropped from its slot the next time the slot is visited.
+
+        :param task: Task returned by schedule
+        :type task: _Task
+        """
+        task.cancelled = True
+
+    def start(self):
+        """Start the wheel thread if it is not already running."""
+        if self._running:
+            return
+
+        self._running = True
+        thread(self._run)
+
+    def stop(self):
+        """Stop the wheel thread after the current tick."""
+        self._running = False
+
+    def running(self):
+        """
+        Return whether the wheel thread is running.
+
+        :returns: running
+        :rtype: bool
+        """
+        return self._running
+
+    def _insert(self, task):
+        slots = len(self._slots)
+        task.rounds = (task.ticks - 1) // slots
+        self._slots[(self._current + task.ticks) % slots].append(task)
+
+    def _run(self):
+        next_tick = timers.now()
+        while self._running:
+            next_tick += self.tick_ms
+            delay = next_tick - timers.now()
+            if delay > 0:
+                sleep(delay)  # noqa
+            self._advance()
+
+    def _advance(self):
+        self._lock.acquire()
+        self._current = (self._current + 1) % len(self._slots)
+        slot = self._slots[self._current]
+        due = []
+        index = 0
+        while index < len(slot):
+            task = slot[index]
+            if task.cancelled or task.rounds == 0:
+                slot[index] = slot[-1]
+                slot.pop()
+                if not task.cancelled:
+                    due.append(task)
+                continue
+            task.rounds -= 1
+            index += 1
+        self._lock.release()
+
+        for task in due:
+            try:
+                task.callback()
+            except Exception as e:
+                if self.error_handler is not None:
+                    self.error_handler(e)
+
+            if task.periodic and not task.cancelled:
+                self._lock.acquire()
+                self._insert(task)
+                self._lock.release()
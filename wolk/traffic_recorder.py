@@ -0,0 +1,296 @@
+"""Recording and replaying of message traffic."""
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import json
+
+from wolkabout.iot.wolk.interface import connectivity_service
+from wolkabout.iot.wolk.model import message
+
+# Direction of a recorded message
+OUTBOUND = 0
+INBOUND = 1
+
+_NO_PAYLOAD = 0xFFFFFFFF
+
+
+def _to_bytes(value):
+    if isinstance(value, bytes) or isinstance(value, bytearray):
+        return value
+    if isinstance(value, memoryview):
+        return bytes(value)
+    return value.encode("utf-8")
+
+
+def _write_uint(buffer, value, length):
+    for shift in range((length - 1) * 8, -8, -8):
+        buffer.append((value >> shift) & 0xFF)
+
+
+def _decode_value(data):
+    if data == "true":
+        return True
+    if data == "false":
+        return False
+    try:
+        return int(data)
+    except Exception:
+        pass
+    try:
+        return float(data)
+    except Exception:
+        return data
+
+
+def _read_uint(data, length):
+    value = 0
+    for byte in data[:length]:
+        value = (value << 8) | byte
+    return value
+
+
+class TrafficRecorder:
+    """
+    Write messages to a stream in a compact binary format.
+
+    Every record consists of a one byte direction, a four byte tick in
+    milliseconds since recording started, a two byte topic length, the
+    topic, a four byte payload length (0xFFFFFFFF for no payload) and
+    the payload. All integers are big-endian.
+    """
+
+    def __init__(self, stream, clock):
+        """
+        Start recording into the stream.
+
+        :param stream: Writable binary stream, e.g. an opened file
+        :type stream: stream
+        :param clock: Function returning the current time in milliseconds
+        :type clock: Callable[[], int]
+        """
+        self.stream = stream
+        self.clock = clock
+        self.start = clock()
+        self.records = 0
+
+    def record(self, direction, recorded_message):
+        """
+        Append a message to the recording.
+
+        :param direction: OUTBOUND or INBOUND
+        :type direction: int
+        :param recorded_message: Message to record
+        :type recorded_message: Message
+        """
+        topic = _to_bytes(recorded_message.topic)
+        record = bytearray()
+        record.append(direction)
+        _write_uint(record, (self.clock() - self.start) & 0xFFFFFFFF, 4)
+        _write_uint(record, len(topic), 2)
+        record.extend(topic)
+
+        if recorded_message.payload is None:
+            _write_uint(record, _NO_PAYLOAD, 4)
+        else:
+            payload = _to_bytes(recorded_message.payload)
+            _write_uint(record, len(payload), 4)
+            record.extend(payload)
+
+        self.stream.write(record)
+        self.records += 1
+
+
+class RecordingConnectivityService(connectivity_service.ConnectivityService):
+    """Connectivity service that records traffic of another one."""
+
+    def __init__(self, connectivity, recorder):
+        """
+        Wrap a connectivity service.
+
+        :param connectivity: Connectivity service doing the actual work
+        :type connectivity: ConnectivityService
+        :param recorder: Recorder receiving all published and received messages
+        :type recorder: TrafficRecorder
+        """
+        self.connectivity = connectivity
+        self.recorder = recorder
+        self._inbound_message_listener = None
+
+    def set_inbound_message_listener(self, listener):
+        """
+        Set the callback method to handle inbound messages.
+
+        :param listener: Method that handles inbound messages
+        :type listener: Callable[[Message], None]
+        """
+        self._inbound_message_listener = listener
+        self.connectivity.set_inbound_message_listener(self._on_inbound_message)
+
+    def set_connection_listener(self, listener):
+        """
+        Set the callback method called when the connection is established.
+
+        :param listener: Method to call when the connection is established
+        :type listener: Callable[[], None]
+        """
+        self.connectivity.set_connection_listener(listener)
+
+    def _on_inbound_message(self, inbound_message):
+        self.recorder.record(INBOUND, inbound_message)
+        self._inbound_message_listener(inbound_message)
+
+    def connect(self):
+        """Establish connection using the wrapped service."""
+        self.connectivity.connect()
+
+    def disconnect(self):
+        """Terminate connection using the wrapped service."""
+        self.connectivity.disconnect()
+
+    def connected(self):
+        """
+        Return current state of the wrapped service.
+
+        :returns: state
+        :rtype: bool
+        """
+        return self.connectivity.connected()
+
+    def publish(self, outbound_message):
+        """
+        Publish the message and record it if it was published.
+
+        :param outbound_message: Message to send
+        :type outbound_message: Message
+        :returns: success
+        :rtype: bool
+        """
+        published = self.connectivity.publish(outbound_message)
+        if published:
+            self.recorder.record(OUTBOUND, outbound_message)
+        return published
+
+    def publish_buffer(self, topic, payload):
+        """
+        Publish the encoded message and record it if it was published.
+
+        :param topic: Encoded topic
+        :type topic: memoryview
+        :param payload: Encoded payload
+        :type payload: memoryview
+        :returns: success
+        :rtype: bool
+        """
+        published = self.connectivity.publish_buffer(topic, payload)
+        if published:
+            self.recorder.record(OUTBOUND, message.Message(bytes(topic), payload))
+        return published
+
+
+class TrafficReplayer:
+    """Feed recorded traffic back through a Wolk instance."""
+
+    def __init__(self, stream):
+        """
+        Read a recording.
+
+        :param stream: Readable binary stream containing TrafficRecorder output
+        :type stream: stream
+        """
+        self.records = []
+
+        while True:
+            header = stream.read(7)
+            if not header or len(header) < 7:
+                break
+            direction = header[0]
+            tick = _read_uint(header[1:], 4)
+            topic = bytes(stream.read(_read_uint(header[5:], 2))).decode("utf-8")
+            payload_length = _read_uint(stream.read(4), 4)
+            if payload_length == _NO_PAYLOAD:
+                payload = None
+            else:
+                payload = bytes(stream.read(payload_length))
+            self.records.append((direction, tick, topic, payload))
+
+    def replay(self, wolk, speed=1.0, sleep_ms=None, direction=None):
+        """
+        Replay the recording.
+
+        Inbound messages are passed to the listener the connectivity
+        service would call, so inbound limits apply. Outbound sensor
+        readings and alarms are added through the Wolk API, and actuator
+        statuses and configuration are published again from the providers,
+        so storage, compaction, TTL and the uplink budget apply as they do
+        to live traffic. Stored messages are published at the end. Other
+        outbound messages, like keep alive, are skipped.
+        Without sleep_ms messages are replayed as fast as possible.
+
+        :param wolk: Instance to replay the traffic through
+        :type wolk: Wolk
+        :param speed: Replay speed relative to the recording, e.g. 10.0
+        :type speed: float
+        :param sleep_ms: (optional) Function sleeping for the given milliseconds
+        :type sleep_ms: Callable[[int], None] or None
+        :param direction: (optional) Replay only INBOUND or OUTBOUND messages
+        :type direction: int or None
+        :returns: number of replayed messages
+        :rtype: int
+        """
+        replayed = 0
+        previous_tick = None
+
+        for record_direction, tick, topic, payload in self.records:
+            if direction is not None and record_direction != direction:
+                continue
+
+            if sleep_ms is not None and previous_tick is not None:
+                delay = int((tick - previous_tick) / speed)
+                if delay > 0:
+                    sleep_ms(delay)
+            previous_tick = tick
+
+            if record_direction == INBOUND:
+                wolk._inbound_message_listener(message.Message(topic, payload))
+                replayed += 1
+            elif self._replay_outbound(wolk, topic, payload):
+                replayed += 1
+
+        wolk.publish()
+        return replayed
+
+    def _replay_outbound(self, wolk, topic, payload):
+        factory = wolk.message_factory
+        reference = topic.split("/")[-1]
+
+        if topic.startswith(factory.SENSOR_READING) or topic.startswith(
+            factory.ALARM
+        ):
+            values = json.loads(bytearray(payload))
+            value = _decode_value(values["data"])
+            timestamp = values.get("utc")
+            if topic.startswith(factory.ALARM):
+                wolk.add_alarm(reference, value, timestamp)
+            else:
+                wolk.add_sensor_reading(reference, value, timestamp)
+            return True
+
+        if topic.startswith(factory.ACTUATOR_STATUS):
+            wolk.publish_actuator_status(reference)
+            return True
+
+        if topic.startswith(factory.CONFIGURATION_STATUS):
+            wolk.publish_configuration()
+            return True
+
+        return False
@@ -0,0 +1,216 @@
+"""Uplink data budget for metered connections."""
+#   Copyright 2018 WolkAbout Technology s.r.o.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import timers
+
+from wolkabout.iot.wolk.interface import connectivity_service
+
+# "Enum" of degradation levels
+NORMAL = 0
+WIDEN_DEADBANDS = 1
+AGGREGATE = 2
+ALARMS_ONLY = 3
+
+
+class UplinkBudget:
+    """
+    Track bytes sent over a rolling window and degrade behaviour as the budget runs out.
+
+    The window is split into buckets, so the usage is kept in a fixed
+    amount of memory however long the window is. When the used share
+    of the budget reaches the thresholds, the level goes to
+    WIDEN_DEADBANDS, AGGREGATE and finally ALARMS_ONLY.
+    """
+
+    # Fixed header, remaining length and topic length field of a PUBLISH packet
+    MQTT_OVERHEAD = 5
+    # Packet identifier, present for QoS 1 and 2
+    MQTT_PACKET_ID = 2
+
+    def __init__(
+        self,
+        budget_bytes,
+        window_ms=2592000000,
+        buckets=30,
+        thresholds=(0.5, 0.75, 0.9),
+        deadband_factor=4,
+        aggregate_size=10,
+        qos=0,
+    ):
+        """
+        Configure the budget.
+
+        :param budget_bytes: Bytes that may be sent within the window
+        :type budget_bytes: int
+        :param window_ms: Length of the rolling window, defaults to 30 days
+        :type window_ms: int
+        :param buckets: Number of buckets the window is split into
+        :type buckets: int
+        :param thresholds: Used shares of the budget at which WIDEN_DEADBANDS,
+            AGGREGATE and ALARMS_ONLY start
+        :type thresholds: tuple
+        :param deadband_factor: Factor applied to sensor deadbands from WIDEN_DEADBANDS on
+        :type deadband_factor: float
+        :param aggregate_size: Number of readings averaged into one from AGGREGATE on
+        :type aggregate_size: int
+        :param qos: Quality of Service used for publishing
+        :type qos: int
+        """
+        self.budget_bytes = budget_bytes
+        self.window_ms = window_ms
+        self.bucket_ms = window_ms // buckets
+        self.thresholds = thresholds
+        self.deadband_factor = deadband_factor
+        self.aggregate_size = aggregate_size
+        self.overhead = self.MQTT_OVERHEAD
+        if qos > 0:
+            self.overhead += self.MQTT_PACKET_ID
+        self.suppressed = 0
+        self._buckets = [0] * buckets
+        self._bucket = timers.now() // self.bucket_ms
+        self._used = 0
+
+    def _rotate(self):
+        bucket = timers.now() // self.bucket_ms
+        if bucket == self._bucket:
+            return
+
+        count = len(self._buckets)
+        for index in range(self._bucket + 1, min(bucket, self._bucket + count) + 1):
+            self._used -= self._buckets[index % count]
+            self._buckets[index % count] = 0
+        self._bucket = bucket
+
+    def account(self, topic_length, payload_length):
+        """
+        Count a published message.
+
+        :param topic_length: Length of the topic in bytes
+        :type topic_length: int
+        :param payload_length: Length of the payload in bytes
+        :type payload_length: int
+        """
+        self._rotate()
+        sent = topic_length + payload_length + self.overhead
+        self._buckets[self._bucket % len(self._buckets)] += sent
+        self._used += sent
+
+    def used(self):
+        """
+        Return bytes sent within the window.
+
+        :returns: used bytes
+        :rtype: int
+        """
+        self._rotate()
+        return self._used
+
+    def level(self):
+        """
+        Return the current degradation level.
+
+        :returns: NORMAL, WIDEN_DEADBANDS, AGGREGATE or ALARMS_ONLY
+        :rtype: int
+        """
+        share = self.used() / self.budget_bytes
+        level = NORMAL
+        for threshold in self.thresholds:
+            if share < threshold:
+                break
+            level += 1
+        return level
+
+
+class MeteredConnectivityService(connectivity_service.ConnectivityService):
+    """Connectivity service that accounts published bytes to an UplinkBudget."""
+
+    def __init__(self, connectivity, budget):
+        """
+        Wrap a connectivity service.
+
+        :param connectivity: Connectivity service doing the actual work
+        :type connectivity: ConnectivityService
+        :param budget: Budget to account published messages to
+        :type budget: UplinkBudget
+        """
+        self.connectivity = connectivity
+        self.budget = budget
+
+    def set_inbound_message_listener(self, listener):
+        """
+        Set the callback method to handle inbound messages.
+
+        :param listener: Method that handles inbound messages
+        :type listener: Callable[[Message], None]
+        """
+        self.connectivity.set_inbound_message_listener(listener)
+
+    def set_connection_listener(self, listener):
+        """
+        Set the callback method called when the connection is established.
+
+        :param listener: Method to call when the connection is established
+        :type listener: Callable[[], None]
+        """
+        self.connectivity.set_connection_listener(listener)
+
+    def connect(self):
+        """Establish connection using the wrapped service."""
+        self.connectivity.connect()
+
+    def disconnect(self):
+        """Terminate connection using the wrapped service."""
+        self.connectivity.disconnect()
+
+    def connected(self):
+        """
+        Return current state of the wrapped service.
+
+        :returns: state
+        :rtype: bool
+        """
+        return self.connectivity.connected()
+
+    def publish(self, outbound_message):
+        """
+        Publish the message and account it if it was published.
+
+        :param outbound_message: Message to send
+        :type outbound_message: Message
+        :returns: success
+        :rtype: bool
+        """
+        published = self.connectivity.publish(outbound_message)
+        if published:
+            payload_length = 0
+            if outbound_message.payload is not None:
+                payload_length = len(outbound_message.payload)
+            self.budget.account(len(outbound_message.topic), payload_length)
+        return published
+
+    def publish_buffer(self, topic, payload):
+        """
+        Publish the encoded message and account it if it was published.
+
+        :param topic: Encoded topic
+        :type topic: memoryview
+        :param payload: Encoded payload
+        :type payload: memoryview
+        :returns: success
+        :rtype: bool
+        """
+        published = self.connectivity.publish_buffer(topic, payload)
+        if published:
+            self.budget.account(len(topic), len(payload))
+        return published
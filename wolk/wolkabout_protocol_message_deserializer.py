@@ -17,6 +17,199 @@ import json
 from wolkabout.iot.wolk.interface import message_deserializer
 from wolkabout.iot.wolk.model import actuator_command
 
+# Byte values used when scanning payloads
+_QUOTE = 34  # "
+_BACKSLASH = 92  # \\
+_COLON = 58  # :
+_OPEN_BRACE = 123  # {
+_CLOSE_BRACE = 125  # }
+_MINUS = 45  # -
+_DOT = 46  # .
+_ZERO = 48  # 0
+_NINE = 57  # 9
+_VALUE_KEY = b'"value"'
+_FLOAT_WORDS = [
+    "inf",
+    "+inf",
+    "-inf",
+    "infinity",
+    "+infinity",
+    "-infinity",
+    "nan",
+    "+nan",
+    "-nan",
+]
+_POWERS_OF_TEN = [
+    1.0,
+    1e1,
+    1e2,
+    1e3,
+    1e4,
+    1e5,
+    1e6,
+    1e7,
+    1e8,
+    1e9,
+    1e10,
+    1e11,
+    1e12,
+    1e13,
+    1e14,
+    1e15,
+    1e16,
+    1e17,
+    1e18,
+    1e19,
+    1e20,
+    1e21,
+    1e22,
+]
+
+
+def _is_whitespace(byte):
+    return byte == 32 or byte == 9 or byte == 10 or byte == 13
+
+
+def _scan_value(payload):
+    """
+    Locate the value token of a payload shaped like {"value": ...}.
+
+    Works directly on the received bytes without copying them.
+    Only string tokens without escape sequences and number tokens
+    are recognized, anything else must be handled by json.loads.
+
+    :param payload: Received payload
+    :type payload: bytes
+    :returns: (quoted, start, end) of the token or None for other shapes
+    :rtype: tuple or None
+    """
+    length = len(payload)
+    i = 0
+    while i < length and _is_whitespace(payload[i]):
+        i += 1
+    if i >= length or payload[i] != _OPEN_BRACE:
+        return None
+    i += 1
+    while i < length and _is_whitespace(payload[i]):
+        i += 1
+    for byte in _VALUE_KEY:
+        if i >= length or payload[i] != byte:
+            return None
+        i += 1
+    while i < length and _is_whitespace(payload[i]):
+        i += 1
+    if i >= length or payload[i] != _COLON:
+        return None
+    i += 1
+    while i < length and _is_whitespace(payload[i]):
+        i += 1
+    if i >= length:
+        return None
+
+    if payload[i] == _QUOTE:
+        quoted = True
+        i += 1
+        start = i
+        while i < length and payload[i] != _QUOTE:
+            if payload[i] == _BACKSLASH or payload[i] > 127:
+                return None
+            i += 1
+        if i >= length:
+            return None
+        end = i
+        i += 1
+    else:
+        quoted = False
+        start = i
+        while i < length and (
+            payload[i] == _MINUS
+            or payload[i] == _DOT
+            or (payload[i] >= _ZERO and payload[i] <= _NINE)
+        ):
+            i += 1
+        end = i
+        if start == end:
+            return None
+
+    while i < length and _is_whitespace(payload[i]):
+        i += 1
+    if i >= length or payload[i] != _CLOSE_BRACE:
+        return None
+    i += 1
+    while i < length and _is_whitespace(payload[i]):
+        i += 1
+    if i != length:
+        return None
+
+    return quoted, start, end
+
+
+def _parse_number(payload, start, end, integer=False):
+    """
+    Parse a decimal number token without building an intermediate string.
+
+    :param payload: Received payload
+    :type payload: bytes
+    :param start: Index of the first byte of the token
+    :type start: int
+    :param end: Index after the last byte of the token
+    :type end: int
+    :param integer: Return int instead of float, fractions are rejected
+    :type integer: bool
+    :returns: parsed number or None if token is not a plain decimal number
+    :rtype: int or float or None
+    """
+    negative = payload[start] == _MINUS
+    if negative:
+        start += 1
+    if start >= end:
+        return None
+
+    mantissa = 0
+    decimals = -1
+    for i in range(start, end):
+        byte = payload[i]
+        if byte == _DOT:
+            if decimals >= 0 or integer or i == start or i == end - 1:
+                return None
+            decimals = 0
+            continue
+        if byte < _ZERO or byte > _NINE:
+            return None
+        mantissa = mantissa * 10 + (byte - _ZERO)
+        if decimals >= 0:
+            decimals += 1
+
+    if negative:
+        mantissa = -mantissa
+    if integer:
+        return mantissa
+
+    # Exact when both operands are exactly representable,
+    # same as float() on the string
+    if decimals <= 0:
+        return float(mantissa)
+    if decimals >= len(_POWERS_OF_TEN) or mantissa > 9007199254740992:
+        return None
+    return float(mantissa) / _POWERS_OF_TEN[decimals]
+
+
+def _decode_text(payload, start, end):
+    """
+    Decode a quoted token that float() would not accept.
+
+    :returns: text or None if the token could still be a number
+    :rtype: str or None
+    """
+    for i in range(start, end):
+        byte = payload[i]
+        if (byte >= _ZERO and byte <= _NINE) or _is_whitespace(byte):
+            return None
+    text = "".join([chr(byte) for byte in payload[start:end]])
+    if text.lower() in _FLOAT_WORDS:
+        return None
+    return text
+
 
 class WolkAboutProtocolMessageDeserializer(message_deserializer.MessageDeserializer):
     """Deserialize messages received from the WolkAbout IoT Platform."""
@@ -27,28 +220,61 @@ class WolkAboutProtocolMessageDeserializer(message_deserializer.MessageDeseriali
     KEEP_ALIVE_RESPONSE = "pong/"
     ACTUATOR_SET = "p2d/actuator_set/"
     CONFIGURATION_SET = "p2d/configuration_set/"
+    # Chunked file transfer is specific to this library and uses its own topics,
+    # it is not compatible with file transfer of the WolkAbout IoT Platform
+    FILE_UPLOAD_INITIATE = "p2d/x_chunked_file_initiate/"
+    FILE_BINARY_RESPONSE = "p2d/x_chunked_file_chunk/"
+    FILE_UPLOAD_ABORT = "p2d/x_chunked_file_abort/"
+    FILE_CHUNK_HEADER_SIZE = 8
+    WILDCARD = "#"
 
-    def __init__(self, device):
+    def __init__(self, device, actuator_wildcard=False, file_transfer=False):
         """
         Create message deserializer and list of inbound topics.
 
         :param device: Device key and actuator references for inbound topics
         :type device: Device
+        :param actuator_wildcard: Subscribe to all actuator references with a
+            single wildcard topic and validate references locally
+        :type actuator_wildcard: bool
+        :param file_transfer: Subscribe to file transfer topics
+        :type file_transfer: bool
         """
         self.inbound_topics = [
             self.KEEP_ALIVE_RESPONSE + device.key,
             self.CONFIGURATION_SET + self.DEVICE_PATH_DELIMITER + device.key,
         ]
+        if file_transfer:
+            for file_topic in [
+                self.FILE_UPLOAD_INITIATE,
+                self.FILE_BINARY_RESPONSE,
+                self.FILE_UPLOAD_ABORT,
+            ]:
+                self.inbound_topics.append(
+                    file_topic + self.DEVICE_PATH_DELIMITER + device.key
+                )
+        self.actuator_wildcard = actuator_wildcard
+        self.actuator_references = set()
+
+        if not device.actuator_references:
+            return
+
+        actuator_topic = (
+            self.ACTUATOR_SET
+            + self.DEVICE_PATH_DELIMITER
+            + device.key
+            + self.TOPIC_DELIMITER
+            + self.REFERENCE_PATH_PREFIX
+        )
+
+        if actuator_wildcard:
+            self.inbound_topics.append(actuator_topic + self.WILDCARD)
+            for reference in device.actuator_references:
+                self.actuator_references.add(reference)
+            return
 
         for reference in device.actuator_references:
-            self.inbound_topics.append(
-                self.ACTUATOR_SET
-                + self.DEVICE_PATH_DELIMITER
-                + device.key
-                + self.TOPIC_DELIMITER
-                + self.REFERENCE_PATH_PREFIX
-                + reference
-            )
+            self.inbound_topics.append(actuator_topic + reference)
 
     def get_inbound_topics(self):
         """
@@ -83,6 +309,10 @@ class WolkAboutProtocolMessageDeserializer(message_deserializer.MessageDeseriali
         """
         actuation_command = message.topic.startswith(self.ACTUATOR_SET)
 
+        if actuation_command and self.actuator_wildcard:
+            reference = message.topic.split(self.TOPIC_DELIMITER)[-1]
+            actuation_command = reference in self.actuator_references
+
         return actuation_command
 
     def is_configuration_command(self, message):
@@ -107,6 +337,23 @@ class WolkAboutProtocolMessageDeserializer(message_deserializer.MessageDeseriali
         :rtype: ActuatorCommand
         """
         reference = message.topic.split("/")[-1]
+
+        token = None
+        if type(message.payload) == 5:  # PBYTES
+            token = _scan_value(message.payload)
+
+        if token is not None:
+            quoted, start, end = token
+            value = _parse_number(message.payload, start, end)
+            if value is None and quoted:
+                value = _decode_text(message.payload, start, end)
+                if value == "true":
+                    value = True
+                elif value == "false":
+                    value = False
+            if value is not None:
+                return actuator_command.ActuatorCommand(reference, value)
+
         bytearray_payload = bytearray(message.payload)
         payload = json.loads(bytearray_payload)
 
@@ -173,6 +420,90 @@ class WolkAboutProtocolMessageDeserializer(message_deserializer.MessageDeseriali
         configurations = temp_dict
         return configurations
 
+    def is_file_upload_initiate(self, message):
+        """
+        Check if message starts a file transfer.
+
+        :param message: The message received
+        :type message: Message
+        :returns: file_upload_initiate
+        :rtype: bool
+        """
+        return message.topic.startswith(self.FILE_UPLOAD_INITIATE)
+
+    def is_file_binary_response(self, message):
+        """
+        Check if message is a file chunk.
+
+        :param message: The message received
+        :type message: Message
+        :returns: file_binary_response
+        :rtype: bool
+        """
+        return message.topic.startswith(self.FILE_BINARY_RESPONSE)
+
+    def is_file_upload_abort(self, message):
+        """
+        Check if message aborts a file transfer.
+
+        :param message: The message received
+        :type message: Message
+        :returns: file_upload_abort
+        :rtype: bool
+        """
+        return message.topic.startswith(self.FILE_UPLOAD_ABORT)
+
+    def parse_file_upload_initiate(self, message):
+        """
+        Deserialize the name, size, chunk size and CRC-32 of a file to be received.
+
+        :param message: The message received
+        :type message: Message
+        :returns: (name, size, chunk_size, digest) or None if the payload is malformed
+        :rtype: tuple or None
+        """
+        try:
+            payload = json.loads(bytearray(message.payload))
+            name = payload["fileName"]
+            size = payload["fileSize"]
+            chunk_size = payload["chunkSize"]
+            digest = payload["fileCrc"]
+        except Exception:
+            return None
+
+        if type(name) != 4 or len(name) == 0:  # PSTRING
+            return None
+        if type(size) not in (0, 1) or size < 0:  # PSMALLINT, PINTEGER
+            return None
+        if type(chunk_size) not in (0, 1) or chunk_size <= 0:
+            return None
+        if type(digest) not in (0, 1) or digest < 0 or digest > 0xFFFFFFFF:
+            return None
+        return name, size, chunk_size, digest
+
+    def parse_file_binary_response(self, message):
+        """
+        Deserialize a file chunk without copying its data.
+
+        The payload is a 4 byte big endian chunk index and a 4 byte big endian
+        CRC-32 of the data, followed by the data.
+
+        :param message: The message received
+        :type message: Message
+        :returns: (index, crc, data) or None if the payload is shorter than the header
+        :rtype: tuple or None
+        """
+        payload = message.payload
+        if payload is None or len(payload) < self.FILE_CHUNK_HEADER_SIZE:
+            return None
+        index = 0
+        crc = 0
+        for i in range(4):
+            index = (index << 8) | payload[i]
+            crc = (crc << 8) | payload[i + 4]
+        data = memoryview(payload)[self.FILE_CHUNK_HEADER_SIZE :]
+        return index, crc, data
+
     def parse_keep_alive_response(self, message):
         """
         Deserializes the message into a UTC timestamp.
@@ -182,6 +513,13 @@ class WolkAboutProtocolMessageDeserializer(message_deserializer.MessageDeseriali
         :returns: UTC timestamp in milliseconds
         :rtype: int
         """
+        if type(message.payload) == 5:  # PBYTES
+            token = _scan_value(message.payload)
+            if token is not None and not token[0]:
+                timestamp = _parse_number(message.payload, token[1], token[2], True)
+                if timestamp is not None:
+                    return timestamp
+
         bytearray_payload = bytearray(message.payload)
         payload = json.loads(bytearray_payload)
         timestamp = payload.get("value")
@@ -30,44 +30,91 @@ class WolkAboutProtocolMessageFactory(message_factory.MessageFactory):
     ACTUATOR_STATUS = "d2p/actuator_status/"
     CONFIGURATION_STATUS = "d2p/configuration_get/"
     KEEP_ALIVE = "ping/"
+    # Private to this library's chunked file transfer, see the deserializer
+    FILE_BINARY_REQUEST = "d2p/x_chunked_file_request/"
+    FILE_UPLOAD_STATUS = "d2p/x_chunked_file_status/"
 
-    def __init__(self, device_key):
+    def __init__(self, device_key, message_pool=None):
         """
         Create a factory for serializing mesasges.
 
+        Factory methods never modify the objects passed to them.
+
         :param device_key: Device key to use when serializing messages
         :type device_key: str
+        :param message_pool: (optional) Pool to take Message instances from
+        :type message_pool: ObjectPool or None
         """
         self.device_key = device_key
-
-    def make_from_sensor_reading(self, reading):
-        """
-        Serialize a sensor reading to be sent to the Platform.
-
-        :param reading: Sensor reading to serialize
-        :type reading: SensorReading
-        :return: serialized message
-        :rtype: message.Message
-        """
-        topic = (
-            self.SENSOR_READING
+        self.message_pool = message_pool
+        self.number_formats = {}
+        self._sensor_reading_topic = self._reference_topic(self.SENSOR_READING)
+        self._alarm_topic = self._reference_topic(self.ALARM)
+        self._actuator_status_topic = self._reference_topic(self.ACTUATOR_STATUS)
+        self._sensor_reading_topic_bytes = self._sensor_reading_topic.encode("utf-8")
+
+    def _reference_topic(self, message_type):
+        return (
+            message_type
             + self.DEVICE_PATH_PREFIX
             + self.device_key
             + self.TOPIC_DELIMITER
             + self.REFERENCE_PATH_PREFIX
-            + reading.reference
         )
-        payload = {}
 
-        if reading.timestamp is not None:
-            payload["utc"] = reading.timestamp
+    def _make_message(self, topic, payload):
+        if self.message_pool is None:
+            return message.Message(topic, payload)
+
+        outbound_message = self.message_pool.acquire()
+        outbound_message.topic = topic
+        outbound_message.payload = payload
+        return outbound_message
 
-        if type(reading.value) == 10:  # PTUPLE
+    def set_number_format(self, reference, number_format):
+        """
+        Format numeric values of a sensor with the given precision.
+
+        Applies to scalar values and to every numeric element of tuples.
+
+        :param reference: The reference of the sensor
+        :type reference: str
+        :param number_format: Format to use, None restores the default
+        :type number_format: NumberFormat or None
+        """
+        if number_format is None:
+            self.number_formats.pop(reference, None)
+        else:
+            self.number_formats[reference] = number_format
+
+    def _format_sensor_value(self, value, reference=None):
+        """
+        Convert a sensor reading value to the string sent to the Platform.
+
+        :param value: The value of the reading
+        :type value: bool or int or float or str or tuple of previous types
+        :param reference: (optional) Sensor reference, selects the number format
+        :type reference: str or None
+        :returns: formatted value
+        :rtype: str
+        """
+        number_format = self.number_formats.get(reference)
+
+        if number_format is not None:
+            value_type = type(value)
+            if value_type == 0 or value_type == 1 or value_type == 2:  # numbers
+                return number_format.format(value)
+
+        if type(value) == 10:  # PTUPLE
             delimiter = ","
 
             values_list = []
 
-            for single_value in reading.value:
+            for single_value in value:
+                if number_format is not None:
+                    value_type = type(single_value)
+                    if value_type == 0 or value_type == 1 or value_type == 2:
+                        single_value = number_format.format(single_value)
                 if single_value is True:
                     single_value = "true"
                 elif single_value is False:
@@ -87,23 +134,144 @@ class WolkAboutProtocolMessageFactory(message_factory.MessageFactory):
                 string_values += str(tuple_value)
                 string_values += delimiter
 
-            string_values = string_values[:-1]
-            reading.value = string_values
+            value = string_values[:-1]
+
+        if value is True:
+            value = "true"
+        elif value is False:
+            value = "false"
+
+        if "\n" in str(value):
+            value = value.replace("\n", "\\n")
+            value = value.replace("\r", "")
+        if '"' in str(value):
+            value = value.replace('"', '\\"')
+
+        return str(value)
+
+    def make_from_sensor_reading(self, reading):
+        """
+        Serialize a sensor reading to be sent to the Platform.
+
+        :param reading: Sensor reading to serialize
+        :type reading: SensorReading
+        :return: serialized message
+        :rtype: message.Message
+        """
+        payload = {}
+
+        if reading.timestamp is not None:
+            payload["utc"] = reading.timestamp
+
+        payload["data"] = self._format_sensor_value(reading.value, reading.reference)
+
+        return self._make_message(
+            self._sensor_reading_topic + reading.reference, json.dumps(payload)
+        )
+
+    def encode_sensor_reading(self, reading, buffer):
+        """
+        Encode a sensor reading directly into a preallocated buffer.
+
+        Produces the topic and payload fields of make_from_sensor_reading.
+        Integers, booleans and the reference are written into the buffer
+        directly, other values are formatted first. Values that need JSON
+        escaping, or do not fit into the buffer, are not encoded.
+
+        :param reading: Sensor reading to serialize
+        :type reading: SensorReading
+        :param buffer: Buffer to encode into, its previous contents are discarded
+        :type buffer: OutboundBuffer
+        :returns: (topic, payload) views into the buffer or None
+        :rtype: tuple or None
+        """
+        value = reading.value
+        value_type = type(value)
+        integer = (
+            value_type == 0 or value_type == 1  # PSMALLINT, PINTEGER
+        ) and reading.reference not in self.number_formats
+
+        buffer.reset()
+        if not (
+            buffer.write(self._sensor_reading_topic_bytes)
+            and buffer.write_ascii(reading.reference)
+        ):
+            return None
+        topic_end = buffer.length
+
+        if reading.timestamp is not None and not (
+            buffer.write(b'{"utc": ')
+            and buffer.write_int(reading.timestamp)
+            and buffer.write(b', "data": "')
+        ):
+            return None
+        if reading.timestamp is None and not buffer.write(b'{"data": "'):
+            return None
+
+        if value is True:
+            written = buffer.write(b"true")
+        elif value is False:
+            written = buffer.write(b"false")
+        elif integer:
+            written = buffer.write_int(value)
+        else:
+            written = buffer.write_ascii(
+                self._format_sensor_value(value, reading.reference)
+            )
+        if not (written and buffer.write(b'"}')):
+            return None
+
+        return buffer.slice(0, topic_end), buffer.slice(topic_end, buffer.length)
+
+    def make_from_sensor_readings(self, readings):
+        """
+        Serialize multiple sensor readings to be sent to the Platform.
+
+        Topic prefix and payload dictionary are shared by the whole batch.
+
+        :param readings: Tuples of (reference, value) or (reference, value, timestamp)
+        :type readings: Iterable[tuple]
+        :returns: messages
+        :rtype: List[Message]
+        """
+        messages = []
+        payload = {}
+
+        for reading in readings:
+            if len(reading) > 2 and reading[2] is not None:
+                payload["utc"] = reading[2]
+            elif "utc" in payload:
+                del payload["utc"]
 
-        if reading.value is True:
-            reading.value = "true"
-        elif reading.value is False:
-            reading.value = "false"
+            payload["data"] = self._format_sensor_value(reading[1], reading[0])
+            messages.append(
+                self._make_message(
+                    self._sensor_reading_topic + reading[0], json.dumps(payload)
+                )
+            )
 
-        if "\n" in str(reading.value):
-            reading.value = reading.value.replace("\n", "\\n")
-            reading.value = reading.value.replace("\r", "")
-        if '"' in str(reading.value):
-            reading.value = reading.value.replace('"', '\\"')
+        return messages
 
-        payload["data"] = str(reading.value)
+    def make_from_sensor_snapshot(self, readings, timestamp=None):
+        """
+        Serialize readings of multiple sensors sampled at the same time.
+
+        The protocol has no multi-reference reading message, so every
+        reference gets its own message, all sharing one timestamp.
+
+        :param readings: Dictionary with sensor reference as key and reading value as value
+        :type readings: dict
+        :param timestamp: (optional) Unix timestamp - if not provided, Platform will assign one
+        :type timestamp: int
+        :returns: messages
+        :rtype: List[Message]
+        """
+        batch = []
 
-        return message.Message(topic, json.dumps(payload))
+        for reference, value in readings.items():
+            batch.append((reference, value, timestamp))
+
+        return self.make_from_sensor_readings(batch)
 
     def make_from_alarm(self, alarm):
         """
@@ -114,27 +282,56 @@ class WolkAboutProtocolMessageFactory(message_factory.MessageFactory):
         :returns: message
         :rtype: Message
         """
-        topic = (
-            self.ALARM
-            + self.DEVICE_PATH_PREFIX
-            + self.device_key
-            + self.TOPIC_DELIMITER
-            + self.REFERENCE_PATH_PREFIX
-            + alarm.reference
-        )
         payload = {}
 
         if alarm.timestamp is not None:
             payload["utc"] = alarm.timestamp
 
         if alarm.active is True:
-            alarm.active = "true"
+            payload["data"] = "true"
         elif alarm.active is False:
-            alarm.active = "false"
+            payload["data"] = "false"
+        else:
+            payload["data"] = alarm.active
 
-        payload["data"] = alarm.active
+        return self._make_message(
+            self._alarm_topic + alarm.reference, json.dumps(payload)
+        )
 
-        return message.Message(topic, json.dumps(payload))
+    def make_from_alarms(self, alarms):
+        """
+        Serialize multiple alarm events to be sent to the Platform.
+
+        Topic prefix and payload dictionary are shared by the whole batch.
+
+        :param alarms: Tuples of (reference, active) or (reference, active, timestamp)
+        :type alarms: Iterable[tuple]
+        :returns: messages
+        :rtype: List[Message]
+        """
+        messages = []
+        payload = {}
+
+        for alarm in alarms:
+            if len(alarm) > 2 and alarm[2] is not None:
+                payload["utc"] = alarm[2]
+            elif "utc" in payload:
+                del payload["utc"]
+
+            if alarm[1] is True:
+                payload["data"] = "true"
+            elif alarm[1] is False:
+                payload["data"] = "false"
+            else:
+                payload["data"] = alarm[1]
+
+            messages.append(
+                self._make_message(
+                    self._alarm_topic + alarm[0], json.dumps(payload)
+                )
+            )
+
+        return messages
 
     def make_from_actuator_status(self, actuator):
         """
@@ -145,61 +342,99 @@ class WolkAboutProtocolMessageFactory(message_factory.MessageFactory):
         :returns: message
         :rtype: Message
         """
-        topic = (
-            self.ACTUATOR_STATUS
-            + self.DEVICE_PATH_PREFIX
-            + self.device_key
-            + self.TOPIC_DELIMITER
-            + self.REFERENCE_PATH_PREFIX
-            + actuator.reference
-        )
         payload = {"status": actuator.state}
 
-        if actuator.value is True:
-            actuator.value = "true"
-        elif actuator.value is False:
-            actuator.value = "false"
-        if "\n" in str(actuator.value):
-            actuator.value = actuator.value.replace("\n", "\\n")
-            actuator.value = actuator.value.replace("\r", "")
-            actuator.value = actuator.value.replace("\\\\n", "\\n")
-        if '"' in str(actuator.value):
-            actuator.value = actuator.value.replace('"', '\\"')
-            actuator.value = actuator.value.replace('\\\\"', '\\"')
-
-        payload["value"] = str(actuator.value)
-
-        return message.Message(topic, json.dumps(payload))
+        value = actuator.value
+        if value is True:
+            value = "true"
+        elif value is False:
+            value = "false"
+        if "\n" in str(value):
+            value = value.replace("\n", "\\n")
+            value = value.replace("\r", "")
+            value = value.replace("\\\\n", "\\n")
+        if '"' in str(value):
+            value = value.replace('"', '\\"')
+            value = value.replace('\\\\"', '\\"')
+
+        payload["value"] = str(value)
+
+        return self._make_message(
+            self._actuator_status_topic + actuator.reference, json.dumps(payload)
+        )
 
     def make_from_configuration(self, configuration):
         """
         Serialize device's configuration to WolkAbout IoT Platform.
 
+        The passed dictionary is left untouched.
+
         :param configuration: Device's current configuration
         :type configuration: dict
         :returns: message
         :rtype: Message
         """
-        topic = self.CONFIGURATION_STATUS + self.DEVICE_PATH_PREFIX + self.device_key
+        snapshot = self.make_configuration_snapshot(configuration)
+        return self.make_from_configuration_snapshot(snapshot)
+
+    def make_configuration_snapshot(self, configuration):
+        """
+        Serialize configuration values into a new dictionary.
+
+        The returned snapshot is never modified afterwards, so it can be
+        kept and compared against later snapshots, while the provider is
+        free to reuse its own dictionary.
+
+        Values are sent as their str(), booleans as "true" and "false".
+        Quotes and newlines are escaped once, by json.dumps.
+
+        :param configuration: Device's current configuration
+        :type configuration: dict
+        :returns: snapshot
+        :rtype: dict
+        """
+        snapshot = {}
 
         for reference, value in configuration.items():
-            if "\n" in str(value):
-                configuration[reference] = value.replace("\n", "\\n")
-                configuration[reference] = value.replace("\\\\n", "\\n")
-                configuration[reference] = value.replace("\r", "")
-            if '"' in str(value):
-                configuration[reference] = value.replace('"', '\\"')
-                configuration[reference] = value.replace('\\\\"', '\\"')
             if value is True:
-                configuration[reference] = "true"
+                value = "true"
             elif value is False:
-                configuration[reference] = "false"
+                value = "false"
+            else:
+                value = str(value)
+            snapshot[reference] = value
+
+        return snapshot
+
+    def make_from_configuration_snapshot(self, snapshot, previous=None):
+        """
+        Serialize a configuration snapshot to WolkAbout IoT Platform.
+
+        When a previous snapshot is given, only references whose value
+        differs from it are included in the message.
+
+        :param snapshot: Snapshot of device's current configuration
+        :type snapshot: dict
+        :param previous: (optional) Last snapshot acknowledged by the Platform
+        :type previous: dict or None
+        :returns: message, or None if nothing changed since previous
+        :rtype: Message or None
+        """
+        topic = self.CONFIGURATION_STATUS + self.DEVICE_PATH_PREFIX + self.device_key
 
-            configuration[reference] = str(value)
+        if previous is None:
+            values = snapshot
+        else:
+            values = {}
+            for reference, value in snapshot.items():
+                if reference not in previous or previous[reference] != value:
+                    values[reference] = value
+            if not values:
+                return None
 
-        payload = {"values": configuration}
+        payload = {"values": values}
 
-        return message.Message(topic, json.dumps(payload))
+        return self._make_message(topic, json.dumps(payload))
 
     def make_from_ping_keep_alive_message(self):
         """
@@ -208,4 +443,42 @@ class WolkAboutProtocolMessageFactory(message_factory.MessageFactory):
         :returns: message
         :rtype: Message
         """
-        return message.Message(self.KEEP_ALIVE + self.device_key, None)
+        return self._make_message(self.KEEP_ALIVE + self.device_key, None)
+
+    def make_file_chunk_request(self, name, chunk, window):
+        """
+        Serialize a request for file chunks, acknowledging all chunks before it.
+
+        :param name: Name of the file
+        :type name: str
+        :param chunk: Index of the first requested chunk
+        :type chunk: int
+        :param window: Number of chunks that may be sent
+        :type window: int
+        :returns: message
+        :rtype: Message
+        """
+        topic = self.FILE_BINARY_REQUEST + self.DEVICE_PATH_PREFIX + self.device_key
+        payload = {"fileName": name, "chunkIndex": chunk, "window": window}
+
+        return self._make_message(topic, json.dumps(payload))
+
+    def make_from_file_transfer_status(self, name, state, error=None):
+        """
+        Serialize the state of a file transfer.
+
+        :param name: Name of the file
+        :type name: str
+        :param state: State of the transfer, e.g. FILE_READY
+        :type state: str
+        :param error: (optional) Reason of the ERROR state
+        :type error: str or None
+        :returns: message
+        :rtype: Message
+        """
+        topic = self.FILE_UPLOAD_STATUS + self.DEVICE_PATH_PREFIX + self.device_key
+        payload = {"fileName": name, "status": state}
+        if error is not None:
+            payload["error"] = error
+
+        return self._make_message(topic, json.dumps(payload))
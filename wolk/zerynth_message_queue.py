@@ -13,7 +13,8 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
-import queue
+import threading
+import timers
 
 from wolkabout.iot.wolk.interface import message_queue
 
@@ -21,14 +22,160 @@ from wolkabout.iot.wolk.interface import message_queue
 class ZerynthMessageQueue(message_queue.MessageQueue):
     """Store messages before they are sent to WolkAbout IoT Platform."""
 
-    def __init__(self, max_size):
+    def __init__(self, max_size, compaction=None, max_bytes=None, ttl=None):
         """
         Initialize a queue and set its maximum capacity.
 
-        :param max_size: Number of messages to store
+        Messages are kept in a preallocated ring buffer guarded by a lock.
+
+        :param max_size: Number of messages to store, at least 1
         :type max_size: int
+        :param compaction: (optional) Strategy applied to stored messages when the queue is full
+        :type compaction: QueueCompaction or None
+        :param max_bytes: (optional) Maximum total size of stored topics and payloads
+        :type max_bytes: int or None
+        :param ttl: (optional) Policy deciding when stored messages expire
+        :type ttl: MessageTtl or None
+        """
+        if max_size <= 0:
+            raise ValueError
+        self.max_size = max_size
+        self.compaction = compaction
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.expired = 0
+        self._buffer = [None] * max_size
+        self._expires = [None] * max_size
+        self._head = 0
+        self._size = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.high_watermark = None
+        self.low_watermark = None
+        self._on_high_watermark = None
+        self._on_low_watermark = None
+        self._above_high_watermark = False
+
+    def set_watermarks(self, high, low, on_high, on_low):
+        """
+        Set occupancy levels at which the producer is notified.
+
+        on_high is called once the number of stored messages reaches high,
+        on_low is called once it afterwards drops to low.
+        Both are called from the thread that stored or removed the message.
+
+        :param high: Number of messages that triggers on_high
+        :type high: int
+        :param low: Number of messages that triggers on_low
+        :type low: int
+        :param on_high: Called with the current size when high is reached
+        :type on_high: Callable[[int], None] or None
+        :param on_low: Called with the current size when low is reached
+        :type on_low: Callable[[int], None] or None
         """
-        self.queue = queue.Queue(maxsize=max_size)
+        self.high_watermark = high
+        self.low_watermark = low
+        self._on_high_watermark = on_high
+        self._on_low_watermark = on_low
+        self._above_high_watermark = False
+
+    def _crossed_high_watermark(self):
+        if (
+            self.high_watermark is None
+            or self._above_high_watermark
+            or self._size < self.high_watermark
+        ):
+            return False
+        self._above_high_watermark = True
+        return True
+
+    def _crossed_low_watermark(self):
+        if not self._above_high_watermark or self._size > self.low_watermark:
+            return False
+        self._above_high_watermark = False
+        return True
+
+    def _message_bytes(self, message):
+        if message.payload is None:
+            return len(message.topic)
+        return len(message.topic) + len(message.payload)
+
+    def _fits(self, message_bytes):
+        if self._size == self.max_size:
+            return False
+        return self.max_bytes is None or self._bytes + message_bytes <= self.max_bytes
+
+    def _make_room(self, message_bytes):
+        # Must be called while holding the lock
+        if self._fits(message_bytes):
+            return True
+        if self.max_bytes is not None and message_bytes > self.max_bytes:
+            # Would not fit even into an empty queue
+            return False
+        self._remove_expired()
+        return self._fits(message_bytes) or (
+            self._compact() and self._fits(message_bytes)
+        )
+
+    def _append(self, message, message_bytes):
+        position = (self._head + self._size) % self.max_size
+        self._buffer[position] = message
+        if self.ttl is not None:
+            ttl = self.ttl.ttl_ms(message)
+            self._expires[position] = None if ttl is None else timers.now() + ttl
+        self._size += 1
+        self._bytes += message_bytes
+
+    def _remove_head(self):
+        message = self._buffer[self._head]
+        self._buffer[self._head] = None
+        self._expires[self._head] = None
+        self._head = (self._head + 1) % self.max_size
+        self._size -= 1
+        self._bytes -= self._message_bytes(message)
+        return message
+
+    def _remove_expired(self):
+        # Must be called while holding the lock
+        if self.ttl is None:
+            return
+
+        now = timers.now()
+        while self._size > 0:
+            expires = self._expires[self._head]
+            if expires is None or expires > now:
+                return
+            self._remove_head()
+            self.expired += 1
+
+    def _compact(self):
+        # Must be called while holding the lock
+        if self.compaction is None:
+            return False
+
+        messages = []
+        expires = []
+        for index in range(self._size):
+            position = (self._head + index) % self.max_size
+            messages.append(self._buffer[position])
+            expires.append(self._expires[position])
+            self._buffer[position] = None
+            self._expires[position] = None
+
+        compacted_messages = self.compaction.compact(messages)
+        self._bytes = 0
+        original = 0
+        for index in range(len(compacted_messages)):
+            # Compaction keeps the order of retained messages
+            while messages[original] is not compacted_messages[index]:
+                original += 1
+            self._buffer[index] = compacted_messages[index]
+            self._expires[index] = expires[original]
+            self._bytes += self._message_bytes(compacted_messages[index])
+        self._head = 0
+        compacted = self._size - len(compacted_messages)
+        self._size = len(compacted_messages)
+        return compacted > 0
 
     def put(self, message):
         """
@@ -36,11 +183,51 @@ class ZerynthMessageQueue(message_queue.MessageQueue):
 
         :param mesasge: Message to store
         :type message: Message
+        :returns: True if stored, False if the queue is full
+        :rtype: bool
         """
-        if self.queue.full():
-            return
+        message_bytes = self._message_bytes(message)
+        self._lock.acquire()
+        if not self._make_room(message_bytes):
+            self._lock.release()
+            return False
+
+        self._append(message, message_bytes)
+        crossed = self._crossed_high_watermark()
+        size = self._size
+        self._lock.release()
+
+        if crossed and self._on_high_watermark is not None:
+            self._on_high_watermark(size)
+        return True
 
-        self.queue.put(message)
+    def put_all(self, messages):
+        """
+        Add multiple messages to the queue while holding the lock once.
+
+        Messages that do not fit into the queue, even after compaction,
+        are discarded.
+
+        :param messages: Messages to store
+        :type messages: List[Message]
+        :returns: number of stored messages
+        :rtype: int
+        """
+        stored = 0
+        self._lock.acquire()
+        for message in messages:
+            message_bytes = self._message_bytes(message)
+            if not self._make_room(message_bytes):
+                break
+            self._append(message, message_bytes)
+            stored += 1
+        crossed = self._crossed_high_watermark()
+        size = self._size
+        self._lock.release()
+
+        if crossed and self._on_high_watermark is not None:
+            self._on_high_watermark(size)
+        return stored
 
     def get(self):
         """
@@ -49,10 +236,20 @@ class ZerynthMessageQueue(message_queue.MessageQueue):
         :return: message
         :rtype: Message or None
         """
-        if self.queue.empty():
+        self._lock.acquire()
+        self._remove_expired()
+        if self._size == 0:
+            self._lock.release()
             return None
 
-        return self.queue.get()
+        message = self._remove_head()
+        crossed = self._crossed_low_watermark()
+        size = self._size
+        self._lock.release()
+
+        if crossed and self._on_low_watermark is not None:
+            self._on_low_watermark(size)
+        return message
 
     def peek(self):
         """
@@ -61,7 +258,55 @@ class ZerynthMessageQueue(message_queue.MessageQueue):
         :return: message
         :rtype: Message or None
         """
-        if self.queue.empty():
-            return None
+        self._lock.acquire()
+        self._remove_expired()
+        message = self._buffer[self._head] if self._size > 0 else None
+        crossed = self._crossed_low_watermark()
+        size = self._size
+        self._lock.release()
+
+        if crossed and self._on_low_watermark is not None:
+            self._on_low_watermark(size)
+        return message
+
+    def pop(self, message):
+        """
+        Remove the first message from the queue if it is the given message.
+
+        Unlike get, expired messages are not removed first, so the message
+        after a peeked one that expired in the meantime is never removed.
 
-        return self.queue.peek()
+        :param message: Message returned by peek
+        :type message: Message
+        :return: True if removed, False if it expired or was compacted away
+        :rtype: bool
+        """
+        self._lock.acquire()
+        removed = self._size > 0 and self._buffer[self._head] is message
+        if removed:
+            self._remove_head()
+        crossed = self._crossed_low_watermark()
+        size = self._size
+        self._lock.release()
+
+        if crossed and self._on_low_watermark is not None:
+            self._on_low_watermark(size)
+        return removed
+
+    def size(self):
+        """
+        Return the number of messages in the queue.
+
+        :return: size
+        :rtype: int
+        """
+        return self._size
+
+    def usage(self):
+        """
+        Return the total size of stored topics and payloads in bytes.
+
+        :return: usage
+        :rtype: int
+        """
+        return self._bytes